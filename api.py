@@ -0,0 +1,279 @@
+import os
+import asyncio
+import argparse
+import datetime
+import multiprocessing
+from functools import partial
+from decimal import Decimal, InvalidOperation
+from contextlib import asynccontextmanager
+from concurrent.futures import ProcessPoolExecutor
+from sqlalchemy.exc import IntegrityError
+from starlette.applications import Starlette
+from starlette.exceptions import HTTPException
+from starlette.responses import JSONResponse, Response, FileResponse, PlainTextResponse
+from starlette.routing import Route
+
+from db import (
+    init_db, create_async_db_engine, DOCUMENT_TABLES, HISTORY_PAGE_SIZE,
+    insert_document, load_items, fetch_document, fetch_history_page, document_values
+)
+from search import search_documents
+from migrations import pending_names
+from numbering import next_number
+from totals import compute_totals, money, to_decimal
+import pdf_store
+from pdf_cache import pdf_cache, cache_key
+from render_queue import enqueue as enqueue_render
+from pdf_gen import generate_professional_pdf, TEMPLATE_VERSION
+from bulk_export import pdf_filename
+import tracing
+
+# -----------------------
+# Headless HTTP API (ASGI)
+# -----------------------
+# Create / get / list / PDF for invoices and quotations on the same schema as
+# the Streamlit app. Requests run on an async engine (aiosqlite / aiomysql);
+# the db helpers are reused unchanged through run_sync. PDFs are rendered on a
+# process pool so the event loop only ever waits on I/O.
+#
+#   python api.py --port 8000          (DB_URL / DB_BACKEND pick the database)
+#   GET  /invoices?limit=50&before=...&q=...   ("partial": true while the search index is being backfilled)
+#   POST /invoices                     {"customer_name", "items": [...], ...}  ("number" optional)
+#   GET  /invoices/{number}
+#   GET  /invoices/{number}/pdf
+#   GET  /metrics                      (span percentiles, Prometheus text; TRACING=1)
+API_RENDER_WORKERS = int(os.getenv("API_RENDER_WORKERS", "0")) or os.cpu_count() or 1
+MAX_PAGE_SIZE = 200
+DOC_TYPES = {"invoices": "INVOICE", "quotations": "QUOTATION"}
+MONEY_FIELDS = {"subtotal", "cgst_rate", "sgst_rate", "discount", "total"}
+
+
+@asynccontextmanager
+async def lifespan(app):
+    init_db()
+    app.state.db = create_async_db_engine()
+    # spawn: workers only need pdf_gen, and forking a running event loop is unsafe
+    app.state.render_pool = ProcessPoolExecutor(max_workers=API_RENDER_WORKERS,
+                                                mp_context=multiprocessing.get_context("spawn"))
+    try:
+        yield
+    finally:
+        app.state.render_pool.shutdown(cancel_futures=True)
+        await app.state.db.dispose()
+
+# -----------------------
+# Helpers
+# -----------------------
+def _table(request) -> str:
+    table = request.path_params["table"]
+    if table not in DOCUMENT_TABLES:
+        raise HTTPException(404, f"Unknown document type: {table}")
+    return table
+
+def _document_json(table: str, row) -> dict:
+    out = {}
+    for field, value in dict(row).items():
+        if field in ("items", "doc_type", "key"):
+            continue
+        if field == DOCUMENT_TABLES[table]:
+            field = "number"
+        if field in MONEY_FIELDS and value is not None:
+            value = str(money(value))
+        elif isinstance(value, (datetime.datetime, datetime.date)):
+            value = str(value)
+        out[field] = value
+    return out
+
+def _detail_json(table: str, row, items) -> dict:
+    amounts = compute_totals(items, row["cgst_rate"] or 0, row["sgst_rate"] or 0, row["discount"] or 0)
+    out = _document_json(table, row)
+    out["items"] = [{"description": desc, "qty": str(to_decimal(qty).normalize()), "price": str(money(price)),
+                     "line_total": str(line)} for (desc, qty, price), line in zip(items, amounts["lines"])]
+    out["cgst"], out["sgst"] = str(amounts["cgst"]), str(amounts["sgst"])
+    return out
+
+def _number(value, field: str, default=None, places: int = 2) -> Decimal:
+    """Non-negative Decimal with at most `places` decimals (the column's scale); 422 otherwise,
+    and when the value is missing without a default"""
+    if value is None:
+        if default is None:
+            raise HTTPException(422, f"{field} is required")
+        return default
+    try:
+        number = to_decimal(value)
+    except (InvalidOperation, TypeError, ValueError):
+        number = None
+    if number is None or not number.is_finite() or number < 0:
+        raise HTTPException(422, f"{field} must be a non-negative number")
+    if number != number.quantize(Decimal(1).scaleb(-places)):
+        raise HTTPException(422, f"{field} has more than {places} decimal places")
+    return number
+
+def _parse_document(table: str, body) -> tuple:
+    """(values for insert_document, items) from a create request; 422 on bad input"""
+    if not isinstance(body, dict):
+        raise HTTPException(422, "Body must be a JSON object")
+    number = str(body.get("number") or "").strip()
+    customer = str(body.get("customer_name") or "").strip()
+    if not customer:
+        raise HTTPException(422, "customer_name is required")
+    raw_items = body.get("items")
+    if not isinstance(raw_items, list) or not raw_items:
+        raise HTTPException(422, "items must be a non-empty list")
+    items = []
+    for i, item in enumerate(raw_items, start=1):
+        if isinstance(item, dict):
+            item = [item.get("description", ""), item.get("qty"), item.get("price")]
+        if not isinstance(item, list) or len(item) != 3:
+            raise HTTPException(422, f"item {i} must be {{description, qty, price}} or [description, qty, price]")
+        items.append((str(item[0] or ""), _number(item[1], f"item {i} qty", places=3), _number(item[2], f"item {i} price")))
+    cgst = _number(body.get("cgst_rate"), "cgst_rate", Decimal(0))
+    sgst = _number(body.get("sgst_rate"), "sgst_rate", Decimal(0))
+    amounts = compute_totals(items, cgst, sgst, _number(body.get("discount"), "discount", Decimal(0)))
+    values = {
+        DOCUMENT_TABLES[table]: number, "customer_name": customer,
+        "customer_address": str(body.get("customer_address") or ""),
+        "subtotal": amounts["subtotal"], "cgst_rate": cgst, "sgst_rate": sgst,
+        "discount": amounts["discount"], "total": amounts["total"],
+        "company_name": str(body.get("company_name") or "Data Center"),
+        "company_address": str(body.get("company_address") or ""),
+    }
+    return values, items
+
+def _history_cursor(value: str):
+    created_at, sep, doc_id = (value or "").rpartition("|")
+    if not sep or not doc_id.isdigit():
+        raise HTTPException(400, "Invalid cursor")
+    return created_at, int(doc_id)
+
+async def _load(request, table: str, number):
+    """(row, items) for one document; 404 when it does not exist"""
+    async with request.app.state.db.connect() as conn:
+        row = await conn.run_sync(lambda c: fetch_document(table, number, conn=c))
+        if row is None:
+            raise HTTPException(404, f"{number} not found")
+        items = await conn.run_sync(lambda c: load_items(table, row["id"], conn=c))
+    return row, items
+
+# -----------------------
+# Endpoints
+# -----------------------
+async def health(request):
+    return JSONResponse({"status": "ok", "pdf_cache": pdf_cache.stats()})
+
+async def list_documents(request):
+    """Newest first; pass the returned `next` back as `before` for the following page"""
+    table = _table(request)
+    params = request.query_params
+    try:
+        limit = min(max(int(params.get("limit", HISTORY_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+    except ValueError:
+        raise HTTPException(400, "limit must be an integer")
+    query = (params.get("q") or "").strip()
+    before = params.get("before")
+    async with request.app.state.db.connect() as conn:
+        if query:
+            if before is not None and not before.isdigit():
+                raise HTTPException(400, "Invalid cursor")
+            rows, has_more = await conn.run_sync(lambda c: search_documents(
+                query, table, before=int(before) if before else None, limit=limit, conn=c))
+            next_cursor = str(rows[-1]["key"]) if has_more else None
+            partial_index = "search" in await conn.run_sync(pending_names)
+        else:
+            cursor = _history_cursor(before) if before else None
+            rows, has_more = await conn.run_sync(lambda c: fetch_history_page(table, cursor, limit, conn=c))
+            next_cursor = f"{rows[-1]['created_at']}|{rows[-1]['id']}" if has_more else None
+            partial_index = False
+    body = {"items": [_document_json(table, r) for r in rows], "next": next_cursor}
+    if partial_index:
+        body["partial"] = True
+    return JSONResponse(body)
+
+async def create_document(request):
+    table = _table(request)
+    try:
+        body = await request.json()
+    except ValueError:
+        raise HTTPException(400, "Body must be JSON")
+    values, items = _parse_document(table, body)
+    number = values[DOCUMENT_TABLES[table]]
+    if not number:
+        # next in the table's series (numbering); may reserve a block, so off the event loop
+        number = values[DOCUMENT_TABLES[table]] = await asyncio.to_thread(next_number, table)
+    try:
+        async with request.app.state.db.begin() as conn:
+            await conn.run_sync(insert_document, table, values, items)
+            if table in pdf_store.FINALIZED_TABLES:
+                # finalized by whichever process runs a RenderQueue (app.py or render_queue.py worker)
+                await conn.run_sync(enqueue_render, table, number)
+            row = await conn.run_sync(lambda c: fetch_document(table, number, conn=c))
+            # echo what was stored, not the request
+            items = await conn.run_sync(lambda c: load_items(table, row["id"], conn=c))
+    except IntegrityError:
+        raise HTTPException(409, f"{number} already exists")
+    return JSONResponse(_detail_json(table, row, items), status_code=201)
+
+async def get_document(request):
+    table = _table(request)
+    row, items = await _load(request, table, request.path_params["number"])
+    return JSONResponse(_detail_json(table, row, items))
+
+async def get_pdf(request):
+    table = _table(request)
+    number = request.path_params["number"]
+    row, items = await _load(request, table, number)
+    digest = row.get("pdf_sha256") if table in pdf_store.FINALIZED_TABLES else None
+    if pdf_store.exists(digest):
+        # finalized: the stored file is the document; sent without rendering
+        etag = f'"{digest}"'
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+        return FileResponse(pdf_store.blob_path(digest), media_type="application/pdf", headers={"ETag": etag},
+                            filename=pdf_filename(table, number), content_disposition_type="inline")
+    values = document_values(table, row)
+    key = cache_key(values, items, TEMPLATE_VERSION)
+    etag = f'"{key}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    data = pdf_cache.get(key)
+    if data is None:
+        with tracing.span("api.pdf_render"):
+            data = await asyncio.get_running_loop().run_in_executor(
+                request.app.state.render_pool, partial(generate_professional_pdf, values, items, DOC_TYPES[table]))
+        pdf_cache.put(key, (table, str(number)), data)
+    return Response(data, media_type="application/pdf", headers={
+        "ETag": etag, "Content-Disposition": f'inline; filename="{pdf_filename(table, number)}"'})
+
+async def metrics(request):
+    # per server process: scrape each worker, or run with --workers 1
+    return PlainTextResponse(tracing.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+async def http_error(request, exc):
+    return JSONResponse({"error": exc.detail}, status_code=exc.status_code)
+
+routes = [
+    Route("/health", health),
+    Route("/metrics", metrics),
+    Route("/{table}", list_documents, methods=["GET"]),
+    Route("/{table}", create_document, methods=["POST"]),
+    # numbers may contain '/', so the PDF route has to be tried first
+    Route("/{table}/{number:path}/pdf", get_pdf),
+    Route("/{table}/{number:path}", get_document),
+]
+
+app = Starlette(routes=routes, lifespan=lifespan, exception_handlers={HTTPException: http_error})
+
+# -----------------------
+# CLI
+# -----------------------
+def main(argv=None):
+    import uvicorn
+    parser = argparse.ArgumentParser(description="Serve the invoice HTTP API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=1, help="server processes")
+    args = parser.parse_args(argv)
+    uvicorn.run("api:app", host=args.host, port=args.port, workers=args.workers, log_level="warning")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+import os
+import tempfile
+import threading
+
+# -----------------------
+# Background file jobs
+# -----------------------
+class BackgroundFileJob:
+    """Run `fn(path, progress=..., **kwargs)` on a daemon thread, writing into a temp file.
+
+    Streamlit reruns (autorefresh) don't interrupt it; each rerun just reads
+    done/total/finished/error off the job kept in session state."""
+
+    def __init__(self, fn, suffix: str, prefix: str = "export_", **kwargs):
+        fd, self.path = tempfile.mkstemp(prefix=prefix, suffix=suffix)
+        os.close(fd)
+        self.kwargs = kwargs
+        self.done = 0
+        self.total = 0
+        self.error = None
+        self.finished = False
+        self._thread = threading.Thread(target=self._run, args=(fn, kwargs), daemon=True)
+        self._thread.start()
+
+    def _progress(self, done, total):
+        self.done, self.total = done, total
+
+    def _run(self, fn, kwargs):
+        try:
+            fn(self.path, progress=self._progress, **kwargs)
+        except Exception as e:
+            self.error = e
+        finally:
+            self.finished = True
@@ -0,0 +1,6 @@
+# Benchmarks for the hot paths, run against a local synthetic database:
+#
+#   python -m benchmarks.generate --rows 100k --items 5      (optional; run does it on demand)
+#   python -m benchmarks.run --rows 100k --save-baseline
+#   python -m benchmarks.run --rows 100k                      (compares with the baseline)
+#   python -m benchmarks.import_profile                      (cold start: imports, first paint, rerun)
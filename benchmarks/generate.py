@@ -0,0 +1,131 @@
+import os
+import sys
+import argparse
+import datetime
+
+# -----------------------
+# Synthetic invoices / quotations
+# -----------------------
+# Deterministic (seeded) documents written straight through executemany in
+# batches, with items, totals, search entries and rollups all consistent with
+# what the app itself writes. db is imported lazily so callers can point DB_URL
+# at a scratch database first.
+SIZES = {"1k": 1_000, "10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+BATCH = 5000
+SPAN_DAYS = 3 * 365
+PREFIXES = {"invoices": "SYN-INV", "quotations": "SYN-QTN"}
+ADJECTIVES = ["A4", "Steel", "Copper", "Wireless", "Laminated", "Annual", "Thermal", "Ergonomic", "Printed", "Spare"]
+NOUNS = ["paper ream", "cable", "router", "service visit", "toner cartridge", "chair", "license", "switch",
+         "maintenance contract", "keyboard", "UPS battery", "projector lamp"]
+GST_RATES = [0, 2.5, 6, 9, 14]
+
+def parse_size(value) -> int:
+    value = str(value).strip().lower().replace("_", "")
+    return SIZES[value] if value in SIZES else int(value)
+
+def default_db_url(rows: int) -> str:
+    return f"sqlite:///{os.path.join(os.path.dirname(__file__), f'bench_{rows}.db')}"
+
+def count_documents(table: str = "invoices") -> int:
+    from sqlalchemy import text
+    from db import engine
+    with engine.connect() as conn:
+        return conn.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar() or 0
+
+def generate(rows: int, items_per_doc: int = 5, table: str = "invoices", seed: int = 0,
+             index_search: bool = True, progress=None) -> int:
+    """Append `rows` synthetic documents to `table`; returns how many were written"""
+    import numpy as np
+    import pandas as pd
+    from sqlalchemy import text
+    import rollups
+    import search
+    from db import engine, init_db, DOCUMENT_TABLES, ITEM_TABLES
+    from totals import batch_totals, line_paise
+    init_db()
+    number_field = DOCUMENT_TABLES[table]
+    items_table, fk = ITEM_TABLES[table]
+    rng = np.random.default_rng(seed)
+    first = count_documents(table)
+    customers = np.array([f"Customer {k:05d} Traders" for k in range(max(50, rows // 20))], dtype=object)
+    base = datetime.datetime.now().replace(microsecond=0) - datetime.timedelta(days=SPAN_DAYS)
+    done = 0
+    while done < rows:
+        n = min(BATCH, rows - done)
+        seq = np.arange(first + done, first + done + n)
+        # created_at grows with the sequence (plus jitter), like real data
+        offsets = (np.arange(done, done + n) / rows * SPAN_DAYS * 86400 + rng.integers(0, 3600, n)).astype("int64")
+        rates = rng.choice(GST_RATES, n)
+        headers = pd.DataFrame({
+            "number": [f"{PREFIXES[table]}/{i:07d}" for i in seq],
+            "customer_name": rng.choice(customers, n),
+            "customer_address": [f"{a} Market Road, Pune" for a in rng.integers(1, 999, n)],
+            "cgst_rate": rates, "sgst_rate": rates,
+            "discount": np.where(rng.random(n) < 0.1, rng.integers(1, 500, n), 0).astype(float),
+        })
+        created = [base + datetime.timedelta(seconds=int(s)) for s in offsets]
+        items = pd.DataFrame({
+            "number": np.repeat(headers["number"].to_numpy(), items_per_doc),
+            "line_no": np.tile(np.arange(1, items_per_doc + 1), n),
+            "description": [f"{a} {b}" for a, b in zip(rng.choice(ADJECTIVES, n * items_per_doc),
+                                                        rng.choice(NOUNS, n * items_per_doc))],
+            "qty": rng.integers(1, 20, n * items_per_doc).astype(float),
+            "price": rng.integers(100, 500_000, n * items_per_doc) / 100,
+        })
+        amounts = batch_totals(items, headers, key="number")
+        headers["subtotal"] = amounts["subtotal"].to_numpy() / 100
+        headers["total"] = amounts["total"].to_numpy() / 100
+        items["line_total"] = line_paise(items["qty"], items["price"]) / 100
+        with engine.begin() as conn:
+            max_id = conn.execute(text(f"SELECT COALESCE(MAX(id), 0) FROM {table}")).scalar()
+            conn.execute(text(f"""
+                INSERT INTO {table} ({number_field}, customer_name, customer_address, subtotal, cgst_rate,
+                                     sgst_rate, discount, total, company_name, company_address, created_at)
+                VALUES (:number, :customer_name, :customer_address, :subtotal, :cgst_rate,
+                        :sgst_rate, :discount, :total, 'Data Center', '', :created_at)
+            """), [dict(r, created_at=c) for r, c in zip(headers.astype(object).to_dict("records"), created)])
+            ids = dict(conn.execute(text(f"SELECT {number_field}, id FROM {table} WHERE id > :m"), {"m": max_id}).all())
+            items["doc_id"] = items["number"].map(ids)
+            conn.execute(text(f"""
+                INSERT INTO {items_table} ({fk}, line_no, description, qty, unit_price, line_total)
+                VALUES (:doc_id, :line_no, :description, :qty, :price, :line_total)
+            """), items[["doc_id", "line_no", "description", "qty", "price", "line_total"]].astype(object).to_dict("records"))
+            if index_search:
+                search.index_documents(conn, table, list(ids.values()))
+        done += n
+        if progress:
+            progress(done, rows)
+    with engine.begin() as conn:
+        rollups.rebuild(conn, DOCUMENT_TABLES)
+    return done
+
+def ensure_rows(rows: int, items_per_doc: int = 5, progress=None):
+    """Top the invoices table up to `rows` documents (quotations get a tenth of that)"""
+    from db import init_db
+    init_db()
+    for table, wanted in (("invoices", rows), ("quotations", max(1, rows // 10))):
+        have = count_documents(table)
+        if have < wanted:
+            generate(wanted - have, items_per_doc, table, seed=have, progress=progress)
+
+# -----------------------
+# CLI
+# -----------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fill a database with synthetic invoices and quotations")
+    parser.add_argument("--rows", default="1k", help="invoice count: 1k, 10k, 100k, 1m or a number")
+    parser.add_argument("--items", type=int, default=5, help="line items per document")
+    parser.add_argument("--db", help="SQLAlchemy URL (default: benchmarks/bench_<rows>.db)")
+    args = parser.parse_args(argv)
+    rows = parse_size(args.rows)
+    os.environ["DB_URL"] = args.db or default_db_url(rows)
+
+    def report(done, total):
+        sys.stderr.write(f"\r{done}/{total} documents")
+        sys.stderr.flush()
+
+    ensure_rows(rows, args.items, report)
+    sys.stderr.write(f"\n{os.environ['DB_URL']} has {count_documents()} invoices\n")
+
+if __name__ == "__main__":
+    main()
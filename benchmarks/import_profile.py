@@ -0,0 +1,102 @@
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+
+# -----------------------
+# Cold-start profile
+# -----------------------
+# Every scenario runs in a fresh interpreter under -X importtime, so nothing is
+# in sys.modules yet. Streamlit's test harness is imported before a marker line;
+# only imports after the marker (the ones the app itself triggers) are counted.
+#   login             first run of app.py while logged out (time to first paint)
+#   <page name>       first logged-in run of that page, then --reruns more reruns
+# first_run_s is wall time through AppTest; rerun_ms is the median app.rerun
+# span (tracing), i.e. the script itself without the test harness's polling.
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MARKER = "--- app imports start ---"
+PAGES = ["Create Invoice", "Invoice History", "Dashboard"]
+
+SCENARIO = r"""
+import os, sys, time, json
+from streamlit.testing.v1 import AppTest
+sys.stderr.write({marker!r} + "\n"); sys.stderr.flush()
+page, reruns = {page!r}, {reruns!r}
+at = AppTest.from_file(os.path.join({root!r}, "app.py"), default_timeout=120)
+if page != "login":
+    at.session_state["logged_in"] = True
+start = time.perf_counter()
+at.run()
+if page != "login":
+    at.sidebar.radio[0].set_value(page)
+    at.run()
+first = time.perf_counter() - start
+for _ in range(reruns if page != "login" else 0):
+    at.run()
+import tracing
+rerun = tracing.snapshot().get("app.rerun")
+print(json.dumps({{"first_run_s": first, "rerun_ms": rerun["p50"] * 1000 if rerun else None,
+                   "errors": [str(e.value)[:200] for e in at.exception]}}))
+"""
+
+def parse_importtime(stderr: str):
+    """[(depth, self_us, cumulative_us, module)] for the import lines after MARKER"""
+    lines = stderr.split(MARKER, 1)[-1].splitlines()
+    out = []
+    for line in lines:
+        if not line.startswith("import time:"):
+            continue
+        self_us, cumulative, name = line[len("import time:"):].split("|", 2)
+        if not self_us.strip().isdigit():
+            continue                        # the header line
+        stripped = name.lstrip(" ")
+        out.append(((len(name) - len(stripped) - 1) // 2, int(self_us), int(cumulative), stripped.rstrip()))
+    return out
+
+def summarise(entries, top: int = 15) -> dict:
+    """Total import time plus the slowest top-level imports, in ms"""
+    roots = [(name, cumulative) for depth, _, cumulative, name in entries if depth == 0]
+    roots.sort(key=lambda r: -r[1])
+    return {"import_ms": round(sum(c for _, c in roots) / 1000, 1), "modules": len(entries),
+            "slowest": [{"module": name, "ms": round(c / 1000, 1)} for name, c in roots[:top]]}
+
+def run_scenario(page: str, reruns: int, db_url: str) -> dict:
+    code = SCENARIO.format(marker=MARKER, page=page, reruns=reruns, root=REPO_ROOT)
+    env = dict(os.environ, DB_URL=db_url, PYTHONPATH=REPO_ROOT, TRACING="1", TRACING_LOG_SECONDS="1e9")
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=REPO_ROOT, env=env,
+                          capture_output=True, text=True)
+    if proc.returncode:
+        raise RuntimeError(f"{page}: {proc.stderr[-2000:]}")
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result.update(summarise(parse_importtime(proc.stderr)))
+    return result
+
+# -----------------------
+# CLI
+# -----------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import-time and first-paint profile of the Streamlit app")
+    parser.add_argument("--pages", default=",".join(PAGES), help="comma-separated pages besides the login page")
+    parser.add_argument("--reruns", type=int, default=5, help="timed reruns per page after the first run")
+    parser.add_argument("--db", help="SQLAlchemy URL (default: an empty scratch SQLite database)")
+    parser.add_argument("--out", help="also write the JSON report here")
+    args = parser.parse_args(argv)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_url = args.db or f"sqlite:///{os.path.join(tmp, 'profile.db')}"
+        report = {}
+        for page in ["login"] + [p.strip() for p in args.pages.split(",") if p.strip()]:
+            report[page] = run_scenario(page, args.reruns, db_url)
+            r = report[page]
+            rerun = f"{r['rerun_ms']:8.1f} ms/rerun" if r["rerun_ms"] is not None else ""
+            sys.stderr.write(f"{page:18} first run {r['first_run_s'] * 1000:8.1f} ms  "
+                             f"imports {r['import_ms']:8.1f} ms ({r['modules']} modules)  {rerun}\n")
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.out:
+        with open(args.out, "w") as fh:
+            fh.write(output + "\n")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import datetime
+import statistics
+
+from benchmarks.generate import parse_size, default_db_url
+
+# -----------------------
+# Hot-path benchmarks
+# -----------------------
+# Each case is a setup function returning (callable, repeat, ops per call).
+# Results are medians over `repeat` timed calls after one warm-up call. They
+# are printed as JSON and, when a baseline exists, compared case by case.
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(REPO_ROOT, "benchmarks", "baseline.json")
+REGRESSION_THRESHOLD = 0.20     # slower than baseline by more than this fails the run
+INSERT_DOCS = 200
+
+def _items_text(lines: int) -> str:
+    return "\n".join(f"Item {i} | {i % 7 + 1} | {100 + i * 1.25:.2f}" for i in range(lines))
+
+def _pdf_case(lines: int, repeat: int):
+    from pdf_gen import generate_simple_invoice_pdf
+    values = {"doc_number": "BENCH-1", "customer_name": "Bench Customer", "customer_address": "1 Bench Road",
+              "cgst_rate": 9, "sgst_rate": 9, "discount": 0}
+    items = [(f"Item {i}", i % 7 + 1, 100 + i * 1.25) for i in range(lines)]
+    return lambda: generate_simple_invoice_pdf(values, items), repeat, 1
+
+def case_parse_items_50():
+    from utils import parse_items
+    text = _items_text(50)
+    return lambda: parse_items(text), 50, 1
+
+def case_parse_items_5000():
+    from utils import parse_items
+    text = _items_text(5000)
+    return lambda: parse_items(text), 10, 1
+
+def case_pdf_1_item():
+    return _pdf_case(1, 10)
+
+def case_pdf_50_items():
+    return _pdf_case(50, 10)
+
+def case_pdf_5000_items():
+    return _pdf_case(5000, 3)
+
+def case_pdf_large_5000_items():
+    from io import BytesIO
+    from pdf_gen import render_large_pdf
+    values = {"doc_number": "BENCH-1", "customer_name": "Bench Customer", "customer_address": "1 Bench Road",
+              "cgst_rate": 9, "sgst_rate": 9, "discount": 0}
+    items = [(f"Item {i}", i % 7 + 1, 100 + i * 1.25) for i in range(5000)]
+    return lambda: render_large_pdf(values, items, BytesIO()), 3, 1
+
+def case_number_to_words():
+    from pdf_gen import number_to_words
+    amounts = [i * 1234.56 for i in range(1000)]
+    return lambda: [number_to_words(a) for a in amounts], 10, len(amounts)
+
+def case_history_first_page():
+    import pandas as pd
+    from db import fetch_history_page
+    def run():
+        rows, _ = fetch_history_page("invoices")
+        return pd.DataFrame([dict(r) for r in rows])
+    return run, 50, 1
+
+def case_history_deep_page():
+    import pandas as pd
+    from sqlalchemy import text
+    from db import engine, fetch_history_page
+    with engine.connect() as conn:
+        count = conn.execute(text("SELECT COUNT(*) FROM invoices")).scalar()
+        cursor = tuple(conn.execute(text(
+            "SELECT created_at, id FROM invoices ORDER BY created_at DESC, id DESC LIMIT 1 OFFSET :o"
+        ), {"o": count // 2}).first())
+    def run():
+        rows, _ = fetch_history_page("invoices", before=cursor)
+        return pd.DataFrame([dict(r) for r in rows])
+    return run, 50, 1
+
+def case_search():
+    from search import search_documents
+    return lambda: search_documents("customer traders"), 50, 1
+
+def case_insert_document():
+    from db import engine, insert_document, delete_row
+    from totals import compute_totals
+    items = [(f"Item {i}", 2, 99.5) for i in range(5)]
+    amounts = compute_totals(items, 9, 9, 0)
+    run_id = datetime.datetime.now().strftime("%H%M%S%f")
+    batch = [0]
+
+    def run():
+        batch[0] += 1
+        for i in range(INSERT_DOCS):
+            with engine.begin() as conn:
+                insert_document(conn, "invoices", {
+                    "invoice_number": f"BENCH-{run_id}-{batch[0]}-{i}", "customer_name": "Bench Customer",
+                    "customer_address": "1 Bench Road", "subtotal": amounts["subtotal"], "cgst_rate": 9,
+                    "sgst_rate": 9, "discount": 0, "total": amounts["total"], "company_name": "Data Center",
+                    "company_address": ""}, items)
+
+    def cleanup():
+        for b in range(1, batch[0] + 1):
+            for i in range(INSERT_DOCS):
+                delete_row("invoices", "invoice_number", f"BENCH-{run_id}-{b}-{i}")
+    run.cleanup = cleanup
+    return run, 3, INSERT_DOCS
+
+CASES = {name[len("case_"):]: fn for name, fn in globals().items() if name.startswith("case_")}
+
+def timed(fn, repeat: int, ops: int) -> dict:
+    fn()    # warm-up: imports, caches, connection pool
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    median = statistics.median(times)
+    return {"median_ms": round(median * 1000 / ops, 4), "min_ms": round(min(times) * 1000 / ops, 4),
+            "ops_per_sec": round(ops / median, 1) if median else None, "runs": repeat}
+
+def run_cases(names) -> dict:
+    results = {}
+    for name in names:
+        fn, repeat, ops = CASES[name]()
+        try:
+            results[name] = timed(fn, repeat, ops)
+        finally:
+            if hasattr(fn, "cleanup"):
+                fn.cleanup()
+        sys.stderr.write(f"{name:24} {results[name]['median_ms']:10.3f} ms/op\n")
+    return results
+
+def compare(results: dict, baseline: dict, threshold: float = REGRESSION_THRESHOLD) -> dict:
+    """Per case: baseline median, ratio (current / baseline) and ok / regression / improved / new"""
+    out = {}
+    for name, result in results.items():
+        base = baseline.get("results", {}).get(name)
+        if not base or not base.get("median_ms"):
+            out[name] = {"status": "new"}
+            continue
+        ratio = result["median_ms"] / base["median_ms"]
+        status = "regression" if ratio > 1 + threshold else "improved" if ratio < 1 - threshold else "ok"
+        out[name] = {"baseline_ms": base["median_ms"], "ratio": round(ratio, 3), "status": status}
+    return out
+
+# -----------------------
+# CLI
+# -----------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the app's hot paths on a synthetic database")
+    parser.add_argument("--rows", default="1k", help="synthetic invoices: 1k, 10k, 100k, 1m or a number")
+    parser.add_argument("--items", type=int, default=5, help="line items per synthetic document")
+    parser.add_argument("--db", help="SQLAlchemy URL (default: benchmarks/bench_<rows>.db, generated on demand)")
+    parser.add_argument("--only", help="comma-separated cases: " + ", ".join(CASES))
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    parser.add_argument("--out", help="also write the JSON report here")
+    args = parser.parse_args(argv)
+
+    rows = parse_size(args.rows)
+    names = [n.strip() for n in args.only.split(",")] if args.only else list(CASES)
+    unknown = [n for n in names if n not in CASES]
+    if unknown:
+        parser.error(f"unknown case(s): {', '.join(unknown)}")
+    # must be set before db is first imported
+    os.environ["DB_URL"] = args.db or default_db_url(rows)
+    os.chdir(REPO_ROOT)   # pdf_gen resolves the logo relative to the working directory
+    sys.path.insert(0, REPO_ROOT)
+    from benchmarks.generate import ensure_rows
+    ensure_rows(rows, args.items)
+
+    report = {
+        "meta": {"rows": rows, "items": args.items, "db": os.environ["DB_URL"].split("://")[0],
+                 "python": platform.python_version(), "machine": platform.machine(),
+                 "timestamp": datetime.datetime.now().isoformat(timespec="seconds")},
+        "results": run_cases(names),
+    }
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as fh:
+            baseline = json.load(fh)
+        report["comparison"] = compare(report["results"], baseline, args.threshold)
+        if baseline.get("meta", {}).get("rows") != rows:
+            report["warning"] = f"baseline was taken at {baseline.get('meta', {}).get('rows')} rows"
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.out:
+        with open(args.out, "w") as fh:
+            fh.write(output + "\n")
+    if args.save_baseline:
+        with open(args.baseline, "w") as fh:
+            fh.write(output + "\n")
+        sys.stderr.write(f"Baseline saved to {args.baseline}\n")
+    regressions = [n for n, c in report.get("comparison", {}).items() if c["status"] == "regression"]
+    if regressions:
+        sys.stderr.write(f"Regressions: {', '.join(regressions)}\n")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+import os
+import re
+import sys
+import argparse
+import datetime
+import zipfile
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, Future, BrokenExecutor
+from sqlalchemy import text
+
+from db import engine, DOCUMENT_TABLES, document_values, load_items_for, document_filters, count_documents
+import pdf_store
+
+# -----------------------
+# Bulk PDF export to ZIP
+# -----------------------
+FETCH_BATCH = 200
+ERRORS_NAME = "ERRORS.txt"
+
+def iter_documents(table: str, start=None, end=None, customer=None):
+    """Yield (doc_number, values, items, pdf_sha256) using a server-side cursor.
+
+    Line items are fetched with one query per batch of headers, on a second
+    connection since the first is busy streaming."""
+    where, params = document_filters(start, end, customer)
+    with engine.connect() as conn, engine.connect() as items_conn:
+        result = conn.execution_options(stream_results=True, yield_per=FETCH_BATCH).execute(
+            text(f"SELECT * FROM {table}{where} ORDER BY created_at, id"), params)
+        for batch in result.mappings().partitions(FETCH_BATCH):
+            items = load_items_for(items_conn, table, [row["id"] for row in batch])
+            for row in batch:
+                yield (row[DOCUMENT_TABLES[table]], document_values(table, row), items[row["id"]],
+                       row.get("pdf_sha256"))
+
+def _render(args):
+    from pdf_gen import generate_professional_pdf   # ReportLab loads in the pool workers only
+    values, items, doc_type = args
+    return generate_professional_pdf(values, items, doc_type=doc_type)
+
+def pdf_filename(table: str, doc_number) -> str:
+    prefix = "Invoice" if table == "invoices" else "Quotation"
+    return f"{prefix}_{re.sub(r'[^A-Za-z0-9._-]+', '_', str(doc_number))}.pdf"
+
+def export_zip(out, table: str = "invoices", start=None, end=None, customer=None,
+               workers: int = None, progress=None, skipped: list = None):
+    """Render every matching document on a process pool and write them into a ZIP.
+
+    `out` is a path or writable binary file. Only about two PDFs per worker are
+    in flight at once, so memory stays flat however many rows match.
+    A document that fails to render is left out and listed, with its error, in
+    ERRORS.txt inside the ZIP; its number is also appended to `skipped` if given.
+    `progress(done, total)` is called after each document.
+    Returns the number of PDFs written."""
+    if table not in DOCUMENT_TABLES:
+        raise ValueError(f"Unknown table: {table}")
+    workers = workers or os.cpu_count() or 1
+    doc_type = "INVOICE" if table == "invoices" else "QUOTATION"
+    total = count_documents(table, start, end, customer)
+    done = 0
+    failed = []
+    window = deque()
+
+    def drain_one(zf):
+        nonlocal done
+        doc_number, pending = window.popleft()
+        try:
+            pdf = pending.result() if isinstance(pending, Future) else pending
+        except BrokenExecutor:
+            raise
+        except Exception as e:
+            failed.append(f"{doc_number}: {type(e).__name__}: {e}")
+            if skipped is not None:
+                skipped.append(doc_number)
+        else:
+            zf.writestr(pdf_filename(table, doc_number), pdf)
+            done += 1
+        if progress:
+            progress(done + len(failed), total)
+
+    # spawn: forking a threaded Streamlit server is unsafe
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool, \
+            zipfile.ZipFile(out, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for doc_number, values, items, digest in iter_documents(table, start, end, customer):
+            # finalized invoices go in as stored, never re-rendered
+            stored = pdf_store.read(digest) if pdf_store.exists(digest) else None
+            window.append((doc_number,
+                           stored if stored is not None else pool.submit(_render, (values, items, doc_type))))
+            if len(window) >= workers * 2:
+                drain_one(zf)
+        while window:
+            drain_one(zf)
+        if failed:
+            zf.writestr(ERRORS_NAME, "Not exported, failed to render:\n" + "\n".join(failed) + "\n")
+    return done
+
+# -----------------------
+# CLI
+# -----------------------
+def _date(value):
+    return datetime.datetime.strptime(value, "%Y-%m-%d").date()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export invoice/quotation PDFs into a ZIP archive")
+    parser.add_argument("out", help="ZIP file to write")
+    parser.add_argument("--table", choices=sorted(DOCUMENT_TABLES), default="invoices")
+    parser.add_argument("--from", dest="start", type=_date, help="first day (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="end", type=_date, help="last day, inclusive (YYYY-MM-DD)")
+    parser.add_argument("--customer", help="customer name contains")
+    parser.add_argument("--workers", type=int, default=None, help="render processes (default: CPU count)")
+    args = parser.parse_args(argv)
+
+    def report(done, total):
+        sys.stderr.write(f"\r{done}/{total} PDFs")
+        sys.stderr.flush()
+
+    skipped = []
+    written = export_zip(args.out, args.table, args.start, args.end, args.customer, args.workers, report, skipped)
+    sys.stderr.write(f"\nWrote {written} PDFs to {args.out}\n")
+    if skipped:
+        sys.stderr.write(f"Skipped {len(skipped)} that failed to render (see {ERRORS_NAME} in the ZIP): "
+                         f"{', '.join(map(str, skipped[:20]))}{' ...' if len(skipped) > 20 else ''}\n")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+import os
+import csv
+import sys
+import argparse
+import datetime
+from decimal import Decimal
+from sqlalchemy import text
+
+from db import engine, DOCUMENT_TABLES, document_filters, count_documents
+
+# -----------------------
+# Streaming table export (CSV / XLSX / Parquet)
+# -----------------------
+# Rows come off a server-side cursor (stream_results + yield_per) and each
+# chunk is written out before the next is fetched, so memory is bounded by
+# CHUNK_ROWS whatever the table size.
+CHUNK_ROWS = 5000
+FORMATS = ["csv", "xlsx", "parquet"]
+
+MONEY_COLUMNS = {"subtotal": 2, "discount": 2, "total": 2, "cgst_rate": 2, "sgst_rate": 2}
+
+def export_columns(table: str):
+    """Header columns available for export, in display order"""
+    return ["id", DOCUMENT_TABLES[table], "customer_name", "customer_address", "subtotal", "cgst_rate",
+            "sgst_rate", "discount", "total", "company_name", "company_address", "created_at"]
+
+def iter_row_chunks(table: str, columns, start=None, end=None, customer=None, chunk_rows: int = CHUNK_ROWS):
+    """Lists of row tuples, at most chunk_rows each"""
+    allowed = set(export_columns(table))
+    bad = [c for c in columns if c not in allowed]
+    if bad:
+        raise ValueError(f"Unknown column(s): {', '.join(bad)}")
+    where, params = document_filters(start, end, customer)
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=chunk_rows).execute(
+            text(f"SELECT {', '.join(columns)} FROM {table}{where} ORDER BY created_at, id"), params)
+        for chunk in result.partitions(chunk_rows):
+            yield chunk
+
+def _timestamp(value):
+    if value is None or isinstance(value, datetime.datetime):
+        return value
+    return datetime.datetime.fromisoformat(str(value))
+
+def _decimal(value, places):
+    if value is None:
+        return None
+    return Decimal(str(value)).quantize(Decimal(1).scaleb(-places))
+
+def _normalizers(columns):
+    """Per-column converters so every backend yields the same types (SQLite returns floats/text)"""
+    out = []
+    for col in columns:
+        if col in MONEY_COLUMNS:
+            out.append(lambda v, p=MONEY_COLUMNS[col]: _decimal(v, p))
+        elif col == "created_at":
+            out.append(_timestamp)
+        else:
+            out.append(None)
+    return out
+
+def _normalize(chunk, normalizers):
+    return [tuple(v if f is None else f(v) for f, v in zip(normalizers, row)) for row in chunk]
+
+# -----------------------
+# Writers
+# -----------------------
+def _write_csv(path, columns, chunks):
+    with open(path, "w", newline="", encoding="utf-8") as fh:
+        writer = csv.writer(fh)
+        writer.writerow(columns)
+        for chunk in chunks:
+            writer.writerows(chunk)
+            yield len(chunk)
+
+def _write_xlsx(path, columns, chunks):
+    from openpyxl import Workbook
+    wb = Workbook(write_only=True)   # rows are flushed to a temp file as they are appended
+    ws = wb.create_sheet("export")
+    ws.append(columns)
+    for chunk in chunks:
+        for row in chunk:
+            ws.append(row)
+        yield len(chunk)
+    wb.save(path)
+
+def _write_parquet(path, columns, chunks):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)")
+    fields = []
+    for col in columns:
+        if col in MONEY_COLUMNS:
+            fields.append(pa.field(col, pa.decimal128(14, MONEY_COLUMNS[col])))
+        elif col == "id":
+            fields.append(pa.field(col, pa.int64()))
+        elif col == "created_at":
+            fields.append(pa.field(col, pa.timestamp("s")))
+        else:
+            fields.append(pa.field(col, pa.string()))
+    schema = pa.schema(fields)
+    with pq.ParquetWriter(path, schema) as writer:
+        for chunk in chunks:
+            arrays = [pa.array(list(values), type=field.type) for values, field in zip(zip(*chunk), schema)]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            yield len(chunk)
+
+WRITERS = {"csv": _write_csv, "xlsx": _write_xlsx, "parquet": _write_parquet}
+
+def export_table(path, table: str = "invoices", fmt: str = None, columns=None,
+                 start=None, end=None, customer=None, progress=None, chunk_rows: int = CHUNK_ROWS):
+    """Stream a document table into a CSV/XLSX/Parquet file; returns rows written.
+
+    `fmt` defaults to the file extension; `columns` to every export column."""
+    fmt = (fmt or os.path.splitext(str(path))[1].lstrip(".")).lower()
+    if fmt not in WRITERS:
+        raise ValueError(f"Unsupported format: {fmt!r} (use one of {', '.join(FORMATS)})")
+    columns = list(columns or export_columns(table))
+    total = count_documents(table, start, end, customer) if progress else 0
+    normalizers = _normalizers(columns)
+    chunks = (_normalize(c, normalizers)
+              for c in iter_row_chunks(table, columns, start, end, customer, chunk_rows))
+    done = 0
+    for written in WRITERS[fmt](path, columns, chunks):
+        done += written
+        if progress:
+            progress(done, total)
+    return done
+
+# -----------------------
+# CLI
+# -----------------------
+def _date(value):
+    return datetime.datetime.strptime(value, "%Y-%m-%d").date()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export invoices/quotations to CSV, XLSX or Parquet")
+    parser.add_argument("out", help="output file (.csv, .xlsx or .parquet)")
+    parser.add_argument("--table", choices=sorted(DOCUMENT_TABLES), default="invoices")
+    parser.add_argument("--format", choices=FORMATS, help="default: from the file extension")
+    parser.add_argument("--columns", help="comma-separated column list (default: all)")
+    parser.add_argument("--from", dest="start", type=_date, help="first day (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="end", type=_date, help="last day, inclusive (YYYY-MM-DD)")
+    parser.add_argument("--customer", help="customer name contains")
+    args = parser.parse_args(argv)
+    columns = [c.strip() for c in args.columns.split(",")] if args.columns else None
+
+    def report(done, total):
+        sys.stderr.write(f"\r{done}/{total} rows")
+        sys.stderr.flush()
+
+    written = export_table(args.out, args.table, args.format, columns, args.start, args.end, args.customer, report)
+    sys.stderr.write(f"\nWrote {written} rows to {args.out}\n")
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,17 @@
 # db.py
 import os
-from sqlalchemy import create_engine, text
+import ast
+import sqlite3
+import datetime
+from contextlib import nullcontext
+from decimal import Decimal
+from sqlalchemy import create_engine, event, text, inspect, make_url
+from sqlalchemy.pool import QueuePool, StaticPool
+from pdf_cache import pdf_cache
+import rollups
+import search
+from totals import line_total, to_qty, money
+from tracing import traced
 
 # -----------------------
 # DB Config (set via ENV or defaults)
@@ -10,56 +21,304 @@ DB_PASS = os.getenv("DB_PASS", "test123")
 DB_HOST = os.getenv("DB_HOST", "91.108.105.168")
 DB_NAME = os.getenv("DB_NAME", "invoice")
 
-# Create SQLAlchemy engine (MySQL)
-engine = create_engine(
-    f"mysql+pymysql://{DB_USER}:{DB_PASS}@{DB_HOST}/{DB_NAME}",
-    pool_pre_ping=True
+# DB_BACKEND=sqlite runs on a local file (SQLITE_PATH) instead of the remote MySQL server;
+# DB_URL, when set, overrides both with any SQLAlchemy URL. The default file lives in
+# data/, which is git-ignored along with SQLite's -wal/-shm files.
+DB_BACKEND = os.getenv("DB_BACKEND", "mysql").lower()
+SQLITE_PATH = os.getenv("SQLITE_PATH", os.path.join("data", "billing.db"))
+DB_URL = os.getenv("DB_URL") or (
+    f"sqlite:///{SQLITE_PATH}" if DB_BACKEND == "sqlite"
+    else f"mysql+pymysql://{DB_USER}:{DB_PASS}@{DB_HOST}/{DB_NAME}"
 )
 
+# Applied to every new SQLite connection. WAL lets readers run alongside the single
+# writer; busy_timeout makes concurrent writers wait instead of failing.
+SQLITE_PRAGMAS = [
+    "journal_mode=WAL",
+    "synchronous=NORMAL",
+    "busy_timeout=5000",
+    "foreign_keys=ON",
+    "cache_size=-20000",
+    "temp_store=MEMORY",
+    "mmap_size=268435456",
+]
+
+# amounts are Decimals (totals.py); sqlite3 has no native binding for them
+sqlite3.register_adapter(Decimal, str)
+
+def _set_sqlite_pragmas(dbapi_conn, _record):
+    cur = dbapi_conn.cursor()
+    for pragma in SQLITE_PRAGMAS:
+        cur.execute(f"PRAGMA {pragma}")
+    cur.close()
+
+def create_db_engine(url: str = DB_URL):
+    if not url.startswith("sqlite"):
+        return create_engine(url, pool_pre_ping=True)
+    if url in ("sqlite://", "sqlite:///:memory:"):
+        # one shared in-memory database for every thread
+        eng = create_engine(url, connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    else:
+        # SQLite creates the file but not its directory
+        os.makedirs(os.path.dirname(os.path.abspath(make_url(url).database)), exist_ok=True)
+        # Streamlit serves each session from its own thread; connections move between them via the pool
+        eng = create_engine(url, connect_args={"check_same_thread": False, "timeout": 5},
+                            poolclass=QueuePool, pool_size=8, max_overflow=8)
+    event.listen(eng, "connect", _set_sqlite_pragmas)
+    return eng
+
+def create_async_db_engine(url: str = DB_URL):
+    """Async twin of create_db_engine (aiosqlite / aiomysql) for the HTTP API"""
+    from sqlalchemy.ext.asyncio import create_async_engine
+    url = make_url(url)
+    if url.get_backend_name() != "sqlite":
+        return create_async_engine(url.set(drivername="mysql+aiomysql"), pool_pre_ping=True,
+                                   pool_size=16, max_overflow=16)
+    eng = create_async_engine(url.set(drivername="sqlite+aiosqlite"), connect_args={"timeout": 5},
+                              pool_size=8, max_overflow=8)
+    event.listen(eng.sync_engine, "connect", _set_sqlite_pragmas)
+    return eng
+
+engine = create_db_engine()
+
+def connect(conn=None):
+    """`conn` itself when the caller has one (e.g. inside an async engine's run_sync), else a pooled connection"""
+    return nullcontext(conn) if conn is not None else engine.connect()
+
+# Dialect-specific DDL fragments
+AUTO_PK = ("INTEGER PRIMARY KEY AUTOINCREMENT" if engine.dialect.name == "sqlite"
+           else "INT AUTO_INCREMENT PRIMARY KEY")
+
+# -----------------------
+# Document tables
+# -----------------------
+DOCUMENT_TABLES = {"invoices": "invoice_number", "quotations": "quotation_number"}
+# header table -> (line item table, foreign key column)
+ITEM_TABLES = {"invoices": ("invoice_items", "invoice_id"), "quotations": ("quotation_items", "quotation_id")}
+
 # -----------------------
-# Initialize DB tables
+# Schema
 # -----------------------
+# DDL lives in migrations/ (versioned, applied once and recorded in
+# schema_version). init_db runs at process start: with the schema current it
+# costs one version query and one backfill-status query. Unfinished backfills
+# continue in a background process (`python -m migrations backfill` runs them
+# in the foreground).
+@traced("db.init_db")
 def init_db():
-    with engine.begin() as conn:
-        conn.execute(text("""
-            CREATE TABLE IF NOT EXISTS invoices (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                invoice_number VARCHAR(64) UNIQUE,
-                customer_name VARCHAR(255),
-                customer_address TEXT,
-                items TEXT,
-                subtotal DECIMAL(12,2),
-                cgst_rate DECIMAL(6,2),
-                sgst_rate DECIMAL(6,2),
-                discount DECIMAL(12,2),
-                total DECIMAL(12,2),
-                company_name VARCHAR(255),
-                company_address TEXT,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        """))
-        conn.execute(text("""
-            CREATE TABLE IF NOT EXISTS quotations (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                quotation_number VARCHAR(64) UNIQUE,
-                customer_name VARCHAR(255),
-                customer_address TEXT,
-                items TEXT,
-                subtotal DECIMAL(12,2),
-                cgst_rate DECIMAL(6,2),
-                sgst_rate DECIMAL(6,2),
-                discount DECIMAL(12,2),
-                total DECIMAL(12,2),
-                company_name VARCHAR(255),
-                company_address TEXT,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        """))
+    import migrations
+    migrations.migrate(engine)
+    migrations.start_backfills(engine)
+
+def ensure_column(conn, table: str, column: str, ddl: str):
+    """ALTER TABLE ADD COLUMN unless it is already there"""
+    if column in {c["name"] for c in inspect(conn).get_columns(table)}:
+        return
+    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+def ensure_index(conn, table: str, name: str, columns: list):
+    """CREATE INDEX unless an index with that name exists (MySQL has no IF NOT EXISTS here)"""
+    if name in {ix["name"] for ix in inspect(conn).get_indexes(table)}:
+        return
+    conn.execute(text(f"CREATE INDEX {name} ON {table} ({', '.join(columns)})"))
+
+# -----------------------
+# Line items
+# -----------------------
+def insert_items(conn, table: str, doc_id: int, items):
+    """executemany the (desc, qty, price) lines of one document in the caller's transaction"""
+    if not items:
+        return
+    items_table, fk = ITEM_TABLES[table]
+    conn.execute(text(f"""
+        INSERT INTO {items_table} ({fk}, line_no, description, qty, unit_price, line_total)
+        VALUES (:doc, :line, :desc, :qty, :price, :total)
+    """), [{"doc": doc_id, "line": n, "desc": desc, "qty": to_qty(qty), "price": money(price),
+            "total": line_total(qty, price)}
+           for n, (desc, qty, price) in enumerate(items, start=1)])
+
+@traced("db.insert_document")
+def insert_document(conn, table: str, values: dict, items) -> int:
+    """Insert a header row plus its line items in the caller's transaction; returns the new id"""
+    # created_at is local time, like every date filter; SQLite's CURRENT_TIMESTAMP default is UTC
+    values = {"created_at": datetime.datetime.now().replace(microsecond=0), **values}
+    cols = list(values)
+    doc_id = conn.execute(text(
+        f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({', '.join(':' + c for c in cols)})"
+    ), values).lastrowid
+    insert_items(conn, table, doc_id, items)
+    rollups.apply_documents(conn, table, [doc_id])
+    search.index_documents(conn, table, [doc_id])
+    return doc_id
+
+@traced("db.load_items")
+def load_items(table: str, doc_id: int, conn=None):
+    """[(desc, qty, price)] for one document, in line order"""
+    items_table, fk = ITEM_TABLES[table]
+    sql = text(f"SELECT description, qty, unit_price FROM {items_table} WHERE {fk} = :id ORDER BY line_no")
+    with connect(conn) as conn:
+        rows = conn.execute(sql, {"id": doc_id}).all()
+        if not rows:
+            return _legacy_items(conn, table, [doc_id]).get(doc_id, [])
+    return [(desc, float(qty), float(price)) for desc, qty, price in rows]
+
+@traced("db.load_items_for")
+def load_items_for(conn, table: str, doc_ids):
+    """{doc id: [(desc, qty, price)]} for a batch of documents in one query"""
+    items = {doc_id: [] for doc_id in doc_ids}
+    if not items:
+        return items
+    items_table, fk = ITEM_TABLES[table]
+    rows = conn.execute(text(
+        f"SELECT {fk}, description, qty, unit_price FROM {items_table} "
+        f"WHERE {fk} IN ({', '.join(str(int(i)) for i in items)}) ORDER BY {fk}, line_no"))
+    for doc_id, desc, qty, price in rows:
+        items[doc_id].append((desc, float(qty), float(price)))
+    empty = [doc_id for doc_id, lines in items.items() if not lines]
+    if empty:
+        items.update(_legacy_items(conn, table, empty))
+    return items
+
+def _legacy_items(conn, table: str, doc_ids) -> dict:
+    """{doc id: items} from the str(items) TEXT of rows the legacy_items backfill has not reached yet"""
+    found = {}
+    for doc_id, raw in conn.execute(text(
+            f"SELECT id, items FROM {table} WHERE items IS NOT NULL AND id IN ({', '.join(str(int(i)) for i in doc_ids)})")):
+        try:
+            found[doc_id] = parse_stored_items(raw)
+        except Exception:
+            continue
+    return found
+
+def migrate_legacy_rows(conn, table: str, doc_ids):
+    """Move str(items) TEXT of these documents into the item tables (the legacy_items backfill).
+
+    Migrated rows get items = NULL; rows whose text cannot be parsed are left untouched."""
+    rows = conn.execute(text(
+        f"SELECT id, items FROM {table} WHERE items IS NOT NULL AND id IN ({', '.join(str(int(i)) for i in doc_ids)})"
+    )).all() if doc_ids else []
+    migrated = []
+    for doc_id, raw in rows:
+        try:
+            items = parse_stored_items(raw)
+        except Exception:
+            continue
+        insert_items(conn, table, doc_id, items)
+        migrated.append({"id": doc_id})
+    if migrated:
+        conn.execute(text(f"UPDATE {table} SET items = NULL WHERE id = :id"), migrated)
 
 # -----------------------
 # Delete row helper
 # -----------------------
+@traced("db.delete_row")
 def delete_row(table: str, field: str, value: str):
     """Delete a row from given table where field = value"""
     with engine.begin() as conn:
-        conn.execute(text(f"DELETE FROM {table} WHERE {field} = :v"), {"v": value})
+        if table in DOCUMENT_TABLES:
+            import migrations
+            # rows the rollups backfill has not added yet must not be subtracted
+            unrolled = migrations.pending_ids(conn, "rollups", table)
+            doc_ids = [r[0] for r in conn.execute(text(f"SELECT id FROM {table} WHERE {field} = :v"), {"v": value})]
+            rollups.apply_documents(conn, table, [i for i in doc_ids if i not in unrolled], sign=-1)
+            search.remove_documents(conn, table, doc_ids)
+        if table in ITEM_TABLES:
+            items_table, fk = ITEM_TABLES[table]
+            conn.execute(text(f"DELETE FROM {items_table} WHERE {fk} IN (SELECT id FROM {table} WHERE {field} = :v)"),
+                         {"v": value})
+        deleted = conn.execute(text(f"DELETE FROM {table} WHERE {field} = :v"), {"v": value}).rowcount
+        if deleted:
+            conn.execute(text("UPDATE table_state SET deletions = deletions + 1 WHERE table_name = :t"), {"t": table})
+    pdf_cache.invalidate(table, value)
+
+# -----------------------
+# Change probe
+# -----------------------
+@traced("db.table_version")
+def table_version(table: str):
+    """(max id, deletion count) -- changes whenever rows are added or removed"""
+    with engine.connect() as conn:
+        row = conn.execute(text(
+            f"SELECT (SELECT MAX(id) FROM {table}), "
+            "(SELECT deletions FROM table_state WHERE table_name = :t)"), {"t": table}).first()
+    return (row[0] or 0, row[1] or 0)
+
+# -----------------------
+# Document rows -> PDF input
+# -----------------------
+
+def parse_stored_items(raw):
+    """Items column (written as str(list of tuples)) -> [(desc, qty, price)]"""
+    return [(i[0], float(i[1]), float(i[2])) for i in ast.literal_eval(raw or "[]")]
+
+def document_values(table: str, row):
+    """Values dict for pdf_gen from an invoices/quotations row mapping"""
+    return {
+        "doc_number": row[DOCUMENT_TABLES[table]], "company_name": row.get("company_name") or "Data Center",
+        "company_address": row.get("company_address") or "", "customer_name": row.get("customer_name") or "",
+        "customer_address": row.get("customer_address") or "", "cgst_rate": float(row.get("cgst_rate") or 0),
+        "sgst_rate": float(row.get("sgst_rate") or 0), "discount": float(row.get("discount") or 0)
+    }
+
+# -----------------------
+# Export / batch filters
+# -----------------------
+def document_filters(start=None, end=None, customer=None):
+    """WHERE clause + params for a created_at date range (inclusive days) and customer substring"""
+    clauses, params = [], {}
+    if start:
+        clauses.append("created_at >= :start")
+        params["start"] = datetime.datetime.combine(start, datetime.time.min)
+    if end:
+        clauses.append("created_at < :end")
+        params["end"] = datetime.datetime.combine(end + datetime.timedelta(days=1), datetime.time.min)
+    if customer:
+        clauses.append("customer_name LIKE :customer")
+        params["customer"] = f"%{customer}%"
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+    return where, params
+
+def count_documents(table: str, start=None, end=None, customer=None) -> int:
+    """Rows document_filters selects, for progress totals"""
+    where, params = document_filters(start, end, customer)
+    with engine.connect() as conn:
+        return conn.execute(text(f"SELECT COUNT(*) FROM {table}{where}"), params).scalar() or 0
+
+# -----------------------
+# History (keyset pagination)
+# -----------------------
+HISTORY_PAGE_SIZE = 50
+
+@traced("db.fetch_history_page")
+def fetch_history_page(table: str, before=None, limit: int = HISTORY_PAGE_SIZE, conn=None):
+    """One page of the history grid, newest first.
+
+    `before` is the (created_at, id) of the last row on the previous page.
+    Returns (rows, has_more); rows only carry the columns the grid shows."""
+    number_field = DOCUMENT_TABLES[table]
+    sql = f"SELECT id, {number_field}, customer_name, created_at, total FROM {table}"
+    params = {"limit": limit + 1}
+    if before:
+        sql += " WHERE created_at < :c OR (created_at = :c AND id < :id)"
+        params.update(c=before[0], id=before[1])
+    sql += " ORDER BY created_at DESC, id DESC LIMIT :limit"
+    with connect(conn) as conn:
+        rows = conn.execute(text(sql), params).mappings().all()
+    return rows[:limit], len(rows) > limit
+
+@traced("db.fetch_history_since")
+def fetch_history_since(table: str, after_id: int, limit: int = HISTORY_PAGE_SIZE):
+    """Grid rows inserted after `after_id`, newest first; at most limit + 1 rows"""
+    number_field = DOCUMENT_TABLES[table]
+    with engine.connect() as conn:
+        return conn.execute(text(
+            f"SELECT id, {number_field}, customer_name, created_at, total FROM {table} "
+            "WHERE id > :id ORDER BY created_at DESC, id DESC LIMIT :limit"),
+            {"id": after_id, "limit": limit + 1}).mappings().all()
+
+@traced("db.fetch_document")
+def fetch_document(table: str, number, conn=None):
+    """Full row for one document, or None"""
+    with connect(conn) as conn:
+        return conn.execute(text(f"SELECT * FROM {table} WHERE {DOCUMENT_TABLES[table]} = :v"),
+                            {"v": number}).mappings().first()
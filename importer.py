@@ -0,0 +1,302 @@
+import sys
+import argparse
+import datetime
+import pandas as pd
+from sqlalchemy import text, bindparam
+
+import rollups
+import search
+from db import engine, init_db, DOCUMENT_TABLES, ITEM_TABLES
+from totals import batch_totals, line_paise
+from item_parser import parse_qty, parse_price
+
+# -----------------------
+# Streaming bulk import from CSV / Excel
+# -----------------------
+# Source files have one row per line item; consecutive rows with the same
+# invoice number form one document and the header fields are taken from its
+# first row. Files are read CHUNK_ROWS at a time, validated and totalled with
+# pandas, and written with executemany in one transaction per chunk.
+CHUNK_ROWS = 5000
+MAX_REPORTED = 1000
+
+HEADER_FIELDS = ["invoice_number", "customer_name", "customer_address", "cgst_rate", "sgst_rate",
+                 "discount", "company_name", "company_address", "created_at"]
+ITEM_FIELDS = ["description", "qty", "price"]
+FIELDS = HEADER_FIELDS + ITEM_FIELDS
+REQUIRED_FIELDS = ["invoice_number", "customer_name", "qty", "price"]
+TEXT_NUMBER_PARSERS = {"qty": (parse_qty, 1000), "price": (parse_price, 100)}
+DEFAULTS = {"customer_address": "", "cgst_rate": 0.0, "sgst_rate": 0.0, "discount": 0.0,
+            "company_name": "Data Center", "company_address": "", "created_at": None, "description": ""}
+
+
+class ImportSummary:
+    def __init__(self):
+        self.rows = 0
+        self.inserted = 0
+        self.duplicates = []
+        self.errors = []
+        self.duplicate_count = 0
+        self.error_count = 0
+
+    def duplicate(self, number):
+        self.duplicate_count += 1
+        if len(self.duplicates) < MAX_REPORTED:
+            self.duplicates.append(number)
+
+    def error(self, row, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED:
+            self.errors.append((row, message))
+
+    def as_dict(self):
+        return {"rows": self.rows, "inserted": self.inserted,
+                "duplicates": self.duplicate_count, "errors": self.error_count,
+                "duplicate_numbers": self.duplicates, "error_rows": self.errors}
+
+
+class _Invoices:
+    """Invoice numbers met so far in the file, across chunks. A number's rows
+    must be consecutive: a later block repeating it is a duplicate. A rejected
+    number stays rejected, including rows carried over from the previous chunk."""
+
+    def __init__(self):
+        self.started = set()
+        self.rejected = set()
+        self.last = ""
+        self.last_repeat = False
+
+    def repeats(self, numbers: pd.Series, summary: ImportSummary) -> pd.Series:
+        """True for rows in a block repeating an earlier number; each such block is reported once"""
+        starts = (numbers != numbers.shift(fill_value=self.last)).astype(bool)
+        block = starts.cumsum()
+        repeat = {0: self.last_repeat}     # block 0 continues the previous chunk's last block
+        for b, number in zip(block[starts], numbers[starts]):
+            repeat[b] = number in self.started
+            if repeat[b]:
+                summary.duplicate(number)
+            self.started.add(number)
+        if len(numbers):
+            self.last = numbers.iloc[-1]
+            self.last_repeat = repeat[block.iloc[-1]]
+        return block.map(repeat).astype(bool)
+
+
+def read_columns(source, sheet=None):
+    """Header row of a CSV/XLSX source, for building the column mapping"""
+    if _is_excel(source):
+        from openpyxl import load_workbook
+        wb = load_workbook(source, read_only=True, data_only=True)
+        try:
+            ws = wb[sheet] if sheet else wb.worksheets[0]
+            header = next(ws.iter_rows(values_only=True), ())
+        finally:
+            wb.close()
+        return [str(c) for c in header if c is not None]
+    return list(pd.read_csv(source, nrows=0).columns)
+
+
+def _is_excel(source):
+    name = source if isinstance(source, str) else getattr(source, "name", "")
+    return name.lower().endswith((".xlsx", ".xlsm"))
+
+
+def iter_chunks(source, sheet=None, chunk_rows: int = CHUNK_ROWS):
+    """DataFrames of at most chunk_rows source rows, without loading the whole file"""
+    if not _is_excel(source):
+        yield from pd.read_csv(source, chunksize=chunk_rows, dtype=str, keep_default_na=False)
+        return
+    from openpyxl import load_workbook
+    wb = load_workbook(source, read_only=True, data_only=True)
+    try:
+        rows = (wb[sheet] if sheet else wb.worksheets[0]).iter_rows(values_only=True)
+        header = [str(c) if c is not None else f"column_{i}" for i, c in enumerate(next(rows, ()))]
+        buf = []
+        for row in rows:
+            buf.append(row[:len(header)])
+            if len(buf) >= chunk_rows:
+                yield pd.DataFrame(buf, columns=header)
+                buf = []
+        if buf:
+            yield pd.DataFrame(buf, columns=header)
+    finally:
+        wb.close()
+
+
+def _prepare(chunk: pd.DataFrame, mapping: dict, first_row: int, summary: ImportSummary, invoices: _Invoices):
+    """Rename to our fields, coerce types and drop rows that fail the item rules
+    (as for typed items: qty and price must be numbers)"""
+    df = pd.DataFrame({field: chunk[col] for field, col in mapping.items() if col in chunk.columns})
+    for field in FIELDS:
+        if field not in df.columns:
+            df[field] = DEFAULTS.get(field)
+    df["source_row"] = range(first_row, first_row + len(df))
+    df["invoice_number"] = df["invoice_number"].astype("string").str.strip()
+    df = df[df["invoice_number"].notna() & (df["invoice_number"] != "")]
+    df = df[~invoices.repeats(df["invoice_number"], summary)]
+    for field in ["qty", "price", "cgst_rate", "sgst_rate", "discount"]:
+        raw = df[field]
+        df[field] = pd.to_numeric(raw.astype("string").str.replace(",", "", regex=False).str.strip(), errors="coerce")
+        if field in TEXT_NUMBER_PARSERS:
+            # "2 nos", "₹1,200.50": only the cells plain to_numeric could not read
+            leftover = df[field].isna() & raw.notna()
+            if leftover.any():
+                df[field] = df[field].astype("float64")
+                df.loc[leftover, field] = raw[leftover].map(lambda v: _text_number(v, *TEXT_NUMBER_PARSERS[field]))
+        if field not in REQUIRED_FIELDS:
+            df[field] = df[field].fillna(DEFAULTS[field])
+    df["customer_name"] = df["customer_name"].astype("string").str.strip().replace("", pd.NA)
+    bad = df["qty"].isna() | df["price"].isna() | df["customer_name"].isna()
+    for row, number in zip(df.loc[bad, "source_row"], df.loc[bad, "invoice_number"]):
+        summary.error(int(row), f"{number}: qty and price must be numbers and customer is required")
+    # a bad line rejects its whole invoice
+    invoices.rejected.update(df.loc[bad, "invoice_number"])
+    df = df[~df["invoice_number"].isin(invoices.rejected)]
+    for field in ["customer_name", "customer_address", "description", "company_name", "company_address"]:
+        df[field] = df[field].fillna(DEFAULTS.get(field) or "").astype(str)
+    df["created_at"] = pd.to_datetime(df["created_at"], errors="coerce", dayfirst=True)
+    return df
+
+
+def _text_number(value, parse, scale) -> float:
+    try:
+        return parse(str(value)) / scale
+    except ValueError:
+        return float("nan")
+
+
+def _totals(df: pd.DataFrame) -> pd.DataFrame:
+    """One header row per invoice with subtotal/total from totals.batch_totals"""
+    df = df.assign(line_total=line_paise(df["qty"], df["price"]) / 100)
+    headers = df.groupby("invoice_number", sort=False).agg(
+        **{f: (f, "first") for f in HEADER_FIELDS if f != "invoice_number"},
+    ).reset_index()
+    amounts = batch_totals(df, headers, key="invoice_number")
+    headers["subtotal"] = amounts["subtotal"].to_numpy() / 100
+    headers["total"] = amounts["total"].to_numpy() / 100
+    return df, headers
+
+
+def _insert(conn, table: str, df: pd.DataFrame, headers: pd.DataFrame):
+    number_field = DOCUMENT_TABLES[table]
+    items_table, fk = ITEM_TABLES[table]
+    headers = headers.astype(object).where(headers.notna(), None)
+    now = datetime.datetime.now().replace(microsecond=0)     # local time, as db.insert_document
+    conn.execute(text(f"""
+        INSERT INTO {table} ({number_field}, customer_name, customer_address, subtotal, cgst_rate, sgst_rate,
+                             discount, total, company_name, company_address, created_at)
+        VALUES (:invoice_number, :customer_name, :customer_address, :subtotal, :cgst_rate, :sgst_rate,
+                :discount, :total, :company_name, :company_address, :created_at)
+    """), [dict(r, created_at=r["created_at"].to_pydatetime() if r["created_at"] is not None else now)
+           for r in headers.to_dict("records")])
+    ids = dict(conn.execute(text(
+        f"SELECT {number_field}, id FROM {table} WHERE {number_field} IN :numbers"
+    ).bindparams(bindparam("numbers", expanding=True)), {"numbers": list(headers["invoice_number"])}).all())
+    df = df.assign(doc_id=df["invoice_number"].map(ids),
+                   line_no=df.groupby("invoice_number", sort=False).cumcount() + 1)
+    conn.execute(text(f"""
+        INSERT INTO {items_table} ({fk}, line_no, description, qty, unit_price, line_total)
+        VALUES (:doc_id, :line_no, :description, :qty, :price, :line_total)
+    """), df[["doc_id", "line_no", "description", "qty", "price", "line_total"]].astype(object).to_dict("records"))
+    rollups.apply_documents(conn, table, list(ids.values()))
+    search.index_documents(conn, table, list(ids.values()))
+
+
+def import_file(source, mapping: dict, table: str = "invoices", sheet=None,
+                chunk_rows: int = CHUNK_ROWS, progress=None) -> ImportSummary:
+    """Import a CSV/XLSX file. `mapping` maps our field names to source column names.
+
+    Invoice numbers already in the table (or repeated in the file) are skipped and
+    listed in the summary; they never abort the run."""
+    missing = [f for f in REQUIRED_FIELDS if f not in mapping]
+    if missing:
+        raise ValueError(f"Column mapping is missing: {', '.join(missing)}")
+    number_field = DOCUMENT_TABLES[table]
+    summary = ImportSummary()
+    invoices = _Invoices()
+    carry = None
+    first_row = 2   # row 1 is the header
+
+    def flush(df):
+        df, headers = _totals(df)
+        numbers = list(headers["invoice_number"])
+        with engine.begin() as conn:
+            dupes = {r[0] for r in conn.execute(text(
+                f"SELECT {number_field} FROM {table} WHERE {number_field} IN :numbers"
+            ).bindparams(bindparam("numbers", expanding=True)), {"numbers": numbers})}
+            for number in numbers:
+                if number in dupes:
+                    summary.duplicate(number)
+            if dupes:
+                df = df[~df["invoice_number"].isin(dupes)]
+                headers = headers[~headers["invoice_number"].isin(dupes)]
+            if len(headers):
+                _insert(conn, table, df, headers)
+        summary.inserted += len(headers)
+
+    for chunk in iter_chunks(source, sheet, chunk_rows):
+        summary.rows += len(chunk)
+        df = _prepare(chunk, mapping, first_row, summary, invoices)
+        first_row += len(chunk)
+        if carry is not None:
+            # its invoice may have been rejected by a line in this chunk
+            carry = carry[~carry["invoice_number"].isin(invoices.rejected)]
+            df = pd.concat([carry, df], ignore_index=True)
+        if df.empty:
+            carry = None
+            continue
+        # the last invoice may continue in the next chunk
+        last = df["invoice_number"].iloc[-1]
+        carry = df[df["invoice_number"] == last]
+        df = df[df["invoice_number"] != last]
+        if len(df):
+            flush(df)
+        if progress:
+            progress(summary)
+    if carry is not None and len(carry):
+        flush(carry)
+        if progress:
+            progress(summary)
+    return summary
+
+# -----------------------
+# CLI
+# -----------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import historical invoices from CSV/XLSX (one row per line item)")
+    parser.add_argument("source", help="CSV or XLSX file")
+    parser.add_argument("--map", action="append", default=[], metavar="FIELD=COLUMN",
+                        help=f"column for a field; fields: {', '.join(FIELDS)} (default: same name)")
+    parser.add_argument("--table", choices=sorted(DOCUMENT_TABLES), default="invoices")
+    parser.add_argument("--sheet", help="worksheet name (XLSX)")
+    parser.add_argument("--chunk", type=int, default=CHUNK_ROWS, help="rows per transaction")
+    args = parser.parse_args(argv)
+
+    columns = set(read_columns(args.source, args.sheet))
+    mapping = {f: f for f in FIELDS if f in columns}
+    for item in args.map:
+        field, _, column = item.partition("=")
+        if field not in FIELDS:
+            parser.error(f"unknown field: {field}")
+        mapping[field] = column
+    if args.table == "quotations" and "quotation_number" in columns and "invoice_number" not in mapping:
+        mapping["invoice_number"] = "quotation_number"
+
+    init_db()
+
+    def report(summary):
+        sys.stderr.write(f"\r{summary.rows} rows read, {summary.inserted} imported")
+        sys.stderr.flush()
+
+    summary = import_file(args.source, mapping, args.table, args.sheet, args.chunk, report)
+    sys.stderr.write("\n")
+    result = summary.as_dict()
+    print(f"Imported {result['inserted']} documents from {result['rows']} rows; "
+          f"{result['duplicates']} duplicate numbers skipped, {result['errors']} invalid rows.")
+    for number in result["duplicate_numbers"]:
+        print(f"duplicate: {number}")
+    for row, message in result["error_rows"]:
+        print(f"row {row}: {message}")
+
+if __name__ == "__main__":
+    main()
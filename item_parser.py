@@ -0,0 +1,129 @@
+import io
+import re
+from array import array
+
+# -----------------------
+# Item lines: "description | qty | price"
+# -----------------------
+# One pass over any iterable of lines (pasted text, an uploaded file, a
+# generator), so the input never has to be split into a list first. Every bad
+# line is collected with its 1-based line number instead of stopping at the
+# first one. Numbers are parsed exactly into integers at the item columns'
+# scale -- qty in thousandths (DECIMAL(12,3)), price in paise (DECIMAL(12,2)) --
+# the same units totals.batch_totals works in. No Streamlit here: utils.parse_items
+# is the UI wrapper, importer uses the number parsers for free-text cells.
+QTY_PLACES = 3
+PRICE_PLACES = 2
+MAX_WHOLE_DIGITS = {QTY_PLACES: 9, PRICE_PLACES: 10}     # what DECIMAL(12, places) can hold
+SHOWN_CHARS = 40
+
+# "2", "2 nos", "1.5 kg", "1,200"
+_QTY = re.compile(r"([+-]?[\d,]*\.?\d*)\s*(?:[A-Za-z][A-Za-z.]*)?")
+# "500", "₹500", "Rs. 1,200.50", "INR 99", "500/-"
+_PRICE = re.compile(r"(?:₹|rs\.?|inr)?\s*([+-]?[\d,]*\.?\d*)\s*(?:/-)?", re.IGNORECASE)
+
+
+def _shown(text: str) -> str:
+    return text if len(text) <= SHOWN_CHARS else text[:SHOWN_CHARS - 1] + "…"
+
+def _scaled(text: str, pattern, places: int, field: str) -> int:
+    """Exact integer value * 10**places; ValueError with a user-facing message"""
+    whole, dot, frac = text.partition(".")
+    sign = 1
+    if not (whole.isdigit() and (frac.isdigit() or not dot) and len(frac) <= places):
+        # anything but plain digits[.digits]
+        match = pattern.fullmatch(text)
+        number = match.group(1) if match else ""
+        sign = -1 if number[:1] == "-" else 1
+        whole, _, frac = number.lstrip("+-").partition(".")
+        whole = whole.replace(",", "")
+        if not (whole + frac).isdigit():
+            raise ValueError(f"{field} '{_shown(text)}' is not a number" if text else f"{field} is missing")
+        if len(frac) > places:
+            raise ValueError(f"{field} '{_shown(text)}' has more than {places} decimal places")
+    whole = whole.lstrip("0")
+    if len(whole) > MAX_WHOLE_DIGITS[places]:
+        raise ValueError(f"{field} '{_shown(text)}' is too large")
+    return sign * (int(whole or 0) * 10 ** places + int(frac.ljust(places, "0") or 0))
+
+def parse_qty(text: str) -> int:
+    """Quantity in thousandths ("2 nos" -> 2000, "1.5" -> 1500)"""
+    return _scaled(text.strip(), _QTY, QTY_PLACES, "qty")
+
+def parse_price(text: str) -> int:
+    """Price in paise ("₹1,200.50" -> 120050, "500/-" -> 50000)"""
+    return _scaled(text.strip(), _PRICE, PRICE_PLACES, "price")
+
+
+class ParsedItems:
+    """Columnar parse result: descriptions plus int64 arrays of qty (thousandths) and price (paise)"""
+    __slots__ = ("descriptions", "qty", "price", "line_numbers", "errors")
+
+    def __init__(self):
+        self.descriptions = []
+        self.qty = array("q")
+        self.price = array("q")
+        self.line_numbers = array("q")
+        self.errors = []             # [(line number, message)]
+
+    def __len__(self):
+        return len(self.descriptions)
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    def items(self) -> list:
+        """[(desc, qty, price)] as the rest of the app passes them around"""
+        return [(desc, q / 10 ** QTY_PLACES, p / 10 ** PRICE_PLACES)
+                for desc, q, p in zip(self.descriptions, self.qty, self.price)]
+
+    def line_paise(self):
+        """Rounded line totals in paise (numpy int64), same rule as totals.line_total"""
+        import numpy as np
+        from totals import _div_half_up
+        qty = np.frombuffer(self.qty, dtype="int64")
+        price = np.frombuffer(self.price, dtype="int64")
+        return _div_half_up(qty * price, 10 ** QTY_PLACES)
+
+
+def parse_lines(lines, first_line: int = 1) -> ParsedItems:
+    """Parse an iterable of item lines (str or bytes); blank lines are skipped"""
+    result = ParsedItems()
+    append_desc, append_qty, append_price = result.descriptions.append, result.qty.append, result.price.append
+    append_line, errors = result.line_numbers.append, result.errors
+    for n, line in enumerate(lines, start=first_line):
+        if isinstance(line, bytes):
+            line = line.decode("utf-8", "replace")
+        line = line.strip()
+        if not line:
+            continue
+        rest, sep, price = line.rpartition("|")
+        desc, sep2, qty = rest.rpartition("|")
+        if not (sep and sep2):
+            errors.append((n, f"expected description | qty | price, got '{_shown(line)}'"))
+            continue
+        try:
+            q = parse_qty(qty)
+            p = parse_price(price)
+        except ValueError as e:
+            errors.append((n, str(e)))
+            continue
+        append_desc("|".join(part.strip() for part in desc.split("|")) if "|" in desc else desc.strip())
+        append_qty(q)
+        append_price(p)
+        append_line(n)
+    return result
+
+def parse_text(text: str) -> ParsedItems:
+    return parse_lines(io.StringIO(text or ""))
+
+def parse_file(fh, encoding: str = "utf-8-sig") -> ParsedItems:
+    """Parse an open text or binary file (e.g. a Streamlit upload) without reading it whole"""
+    if not isinstance(fh.read(0), bytes):
+        return parse_lines(fh)
+    text = io.TextIOWrapper(fh, encoding=encoding, errors="replace")
+    try:
+        return parse_lines(text)
+    finally:
+        text.detach()   # leave the caller's file open
@@ -0,0 +1,279 @@
+import re
+import sys
+import time
+import argparse
+import datetime
+import pkgutil
+import importlib
+import threading
+import multiprocessing
+from contextlib import contextmanager, nullcontext
+from sqlalchemy import text, inspect
+
+# -----------------------
+# Versioned schema migrations
+# -----------------------
+# Each schema change is a module mNNNN_<name>.py in this package. Modules are
+# applied once, in number order, each in its own transaction, and recorded in
+# schema_version. A module defines upgrade(conn); upgrade_sqlite(conn) or
+# upgrade_mysql(conn), when present, is used instead on that dialect. MySQL
+# commits DDL implicitly, so an upgrade must be safe to run twice (IF NOT
+# EXISTS, db.ensure_index / ensure_column). That is also how databases created
+# before this registry adopt it: the baseline modules find everything already
+# there. Processes starting together apply each migration once: MySQL holds a
+# named lock (GET_LOCK) for the run, SQLite takes the write lock at the start
+# of each migration's transaction and re-reads the version under it.
+#
+# Data changes to large tables are not done inside a migration. The migration
+# calls schedule_backfill(), and run_backfills() works through the rows in
+# short id-ordered batches, one transaction each, saving its position in
+# schema_backfills after every batch. It can run while the app is serving and
+# resumes where it stopped. Only rows that existed when the backfill was
+# scheduled are visited; later rows are handled by the live code paths.
+# db.init_db starts it in a daemon process (start_backfills), so process start
+# never waits for it; until it is done, readers must cope with rows it has not
+# reached (pending_ids, pending_names).
+#
+#   python -m migrations status | migrate | backfill
+BACKFILL_BATCH = 1000
+# Pause between batches: SQLite's write lock is not fair, and without a gap a
+# backfill can starve the app's own writes past busy_timeout.
+BACKFILL_PAUSE = 0.05
+_MODULE = re.compile(r"m(\d{4})_\w+$")
+
+
+def available() -> list:
+    """[(version, module name)] of the migration modules, in order"""
+    found = [(int(m.group(1)), info.name) for info in pkgutil.iter_modules(__path__)
+             if (m := _MODULE.match(info.name))]
+    return sorted(found)
+
+def _create_registry(conn):
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INT PRIMARY KEY,
+            name VARCHAR(128) NOT NULL,
+            applied_at DATETIME NOT NULL
+        )
+    """))
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS schema_backfills (
+            name VARCHAR(64) NOT NULL,
+            table_name VARCHAR(64) NOT NULL,
+            last_id BIGINT NOT NULL DEFAULT 0,
+            until_id BIGINT NOT NULL,
+            scheduled_at DATETIME NOT NULL,
+            done_at DATETIME,
+            PRIMARY KEY (name, table_name)
+        )
+    """))
+
+def current_version(conn) -> int:
+    if not inspect(conn).has_table("schema_version"):
+        return 0
+    return conn.execute(text("SELECT COALESCE(MAX(version), 0) FROM schema_version")).scalar()
+
+def _now():
+    return datetime.datetime.now().replace(microsecond=0)
+
+@contextmanager
+def _mysql_lock(engine, seconds: int = 600):
+    with engine.connect() as conn:
+        if not conn.execute(text("SELECT GET_LOCK('schema_migrations', :s)"), {"s": seconds}).scalar():
+            raise RuntimeError("Timed out waiting for another process's schema migration")
+        try:
+            yield
+        finally:
+            conn.execute(text("SELECT RELEASE_LOCK('schema_migrations')"))
+
+def migrate(engine, log=None) -> list:
+    """Apply every migration newer than schema_version; returns the module names applied"""
+    migrations = available()
+    with engine.connect() as conn:
+        current = current_version(conn)
+    if not migrations or current >= migrations[-1][0]:
+        return []
+    applied = []
+    with _mysql_lock(engine) if engine.dialect.name == "mysql" else nullcontext():
+        with engine.begin() as conn:
+            _create_registry(conn)
+        for version, name in migrations:
+            if version <= current:
+                continue
+            module = importlib.import_module(f"{__name__}.{name}")
+            with engine.begin() as conn:
+                if conn.dialect.name == "sqlite":
+                    # any write takes SQLite's write lock; held until this migration commits
+                    conn.execute(text("UPDATE schema_version SET name = name WHERE version = 0"))
+                if current_version(conn) >= version:
+                    continue            # applied by another process meanwhile
+                upgrade = getattr(module, f"upgrade_{conn.dialect.name}", None) or module.upgrade
+                upgrade(conn)
+                conn.execute(text("INSERT INTO schema_version (version, name, applied_at) VALUES (:v, :n, :at)"),
+                             {"v": version, "n": name, "at": _now()})
+            applied.append(name)
+            if log:
+                log(f"applied {name}")
+    return applied
+
+# -----------------------
+# Online backfills
+# -----------------------
+def _backfills() -> dict:
+    """name -> (apply(conn, table, ids), tables, extra WHERE clause)"""
+    import db
+    import rollups
+    import search
+    return {
+        "legacy_items": (db.migrate_legacy_rows, list(db.ITEM_TABLES), "items IS NOT NULL"),
+        "rollups": (rollups.apply_documents, list(db.DOCUMENT_TABLES), None),
+        "search": (search.index_documents, list(db.DOCUMENT_TABLES), None),
+    }
+
+def schedule_backfill(conn, name: str):
+    """Queue backfill `name` over the rows its tables hold now (call from a migration)"""
+    _, tables, _ = _backfills()[name]
+    for table in tables:
+        until = conn.execute(text(f"SELECT COALESCE(MAX(id), 0) FROM {table}")).scalar()
+        conn.execute(text("""
+            INSERT INTO schema_backfills (name, table_name, last_id, until_id, scheduled_at, done_at)
+            VALUES (:n, :t, 0, :until, :at, :done)
+        """), {"n": name, "t": table, "until": until, "at": _now(), "done": None if until else _now()})
+
+def pending_backfills(conn) -> list:
+    if not inspect(conn).has_table("schema_backfills"):
+        return []
+    return conn.execute(text(
+        "SELECT name, table_name, last_id, until_id FROM schema_backfills WHERE done_at IS NULL ORDER BY scheduled_at, name"
+    )).mappings().all()
+
+def pending_names(conn) -> set:
+    """Names of the backfills not finished yet"""
+    return {job["name"] for job in pending_backfills(conn)}
+
+def pending_ids(conn, name: str, table: str) -> range:
+    """Ids of `table` that backfill `name` has still to visit (empty once it is done).
+
+    Takes the same lock as a backfill batch, so no batch runs between this and
+    the caller's commit: call it first in a writing transaction, before reading
+    the rows it is about."""
+    key = {"n": name, "t": table}
+    conn.execute(text(
+        "UPDATE schema_backfills SET last_id = last_id WHERE name = :n AND table_name = :t AND done_at IS NULL"), key)
+    row = conn.execute(text(
+        "SELECT last_id, until_id FROM schema_backfills WHERE name = :n AND table_name = :t AND done_at IS NULL"),
+        key).first()
+    return range(row[0] + 1, row[1] + 1) if row else range(0)
+
+def finish_backfill(conn, name: str):
+    """Mark backfill `name` done on every table, for code that has just redone its work in full
+    (rollups.rebuild). Call it first in that transaction: it waits for a running batch."""
+    conn.execute(text(
+        "UPDATE schema_backfills SET last_id = until_id, done_at = :at WHERE name = :n AND done_at IS NULL"),
+        {"n": name, "at": _now()})
+
+def run_backfills(engine, batch: int = BACKFILL_BATCH, pause: float = BACKFILL_PAUSE, progress=None) -> int:
+    """Work through every unfinished backfill; returns the rows visited.
+
+    Each batch starts by locking its schema_backfills row (a no-op update takes
+    the row lock on MySQL and the write lock on SQLite), so several processes
+    can run this at once without doing a batch twice.
+    `progress(name, table, last_id, until_id)` is called after each batch."""
+    with engine.connect() as conn:
+        jobs = pending_backfills(conn)
+    if not jobs:
+        return 0
+    registry = _backfills()
+    visited = 0
+    for job in jobs:
+        name, table = job["name"], job["table_name"]
+        apply, _, where = registry[name]
+        key = {"n": name, "t": table}
+        while True:
+            with engine.begin() as conn:
+                conn.execute(text("UPDATE schema_backfills SET last_id = last_id WHERE name = :n AND table_name = :t"), key)
+                last, until, done = conn.execute(text(
+                    "SELECT last_id, until_id, done_at FROM schema_backfills WHERE name = :n AND table_name = :t"), key).one()
+                if done is not None:
+                    break
+                ids = [r[0] for r in conn.execute(text(
+                    f"SELECT id FROM {table} WHERE id > :last AND id <= :until{f' AND {where}' if where else ''} "
+                    "ORDER BY id LIMIT :limit"), {"last": last, "until": until, "limit": batch})]
+                if ids:
+                    apply(conn, table, ids)
+                conn.execute(text("UPDATE schema_backfills SET last_id = :last, done_at = :done WHERE name = :n AND table_name = :t"),
+                             {**key, "last": ids[-1] if ids else until, "done": None if ids else _now()})
+            if not ids:
+                break
+            visited += len(ids)
+            if progress:
+                progress(name, table, ids[-1], until)
+            if pause:
+                time.sleep(pause)
+    return visited
+
+_backfill_worker = None
+_backfill_lock = threading.Lock()
+
+def _backfill_process(url: str):
+    from db import create_db_engine
+    run_backfills(create_db_engine(url))
+
+def start_backfills(engine):
+    """run_backfills in a daemon process, one per process; returns it, or None with nothing to do.
+
+    A process rather than a thread: the legacy_items backfill is CPU-bound
+    (ast.literal_eval) and would hold the GIL against the app. A private
+    in-memory SQLite database is only visible here, so it gets a thread."""
+    global _backfill_worker
+    with _backfill_lock:
+        if _backfill_worker is not None and _backfill_worker.is_alive():
+            return _backfill_worker
+        with engine.connect() as conn:
+            if not pending_backfills(conn):
+                return None
+        if engine.dialect.name == "sqlite" and engine.url.database in (None, "", ":memory:"):
+            _backfill_worker = threading.Thread(target=run_backfills, args=(engine,), name="backfills", daemon=True)
+        else:
+            # spawn: forking a threaded Streamlit server is unsafe
+            ctx = multiprocessing.get_context("spawn")
+            _backfill_worker = ctx.Process(target=_backfill_process, name="backfills", daemon=True,
+                                           args=(engine.url.render_as_string(hide_password=False),))
+        _backfill_worker.start()
+        return _backfill_worker
+
+# -----------------------
+# CLI
+# -----------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m migrations", description="Schema migrations and backfills")
+    parser.add_argument("command", choices=["status", "migrate", "backfill"],
+                        help="status: versions and unfinished backfills; migrate: apply pending migrations "
+                             "(no backfills); backfill: migrate, then run backfills to completion")
+    parser.add_argument("--batch", type=int, default=BACKFILL_BATCH, help="rows per backfill transaction")
+    parser.add_argument("--pause", type=float, default=BACKFILL_PAUSE, help="seconds to sleep between batches")
+    args = parser.parse_args(argv)
+    from db import engine
+
+    def log(message):
+        sys.stderr.write(message + "\n")
+
+    if args.command == "status":
+        with engine.connect() as conn:
+            current = current_version(conn)
+            jobs = pending_backfills(conn)
+        for version, name in available():
+            print(f"{'applied' if version <= current else 'pending'}\t{name}")
+        for job in jobs:
+            print(f"backfill\t{job['name']} on {job['table_name']}: id {job['last_id']} of {job['until_id']}")
+        return
+    migrate(engine, log)
+    if args.command == "backfill":
+        def report(name, table, last_id, until_id):
+            sys.stderr.write(f"\r{name} on {table}: id {last_id} of {until_id}")
+            sys.stderr.flush()
+
+        visited = run_backfills(engine, args.batch, args.pause, report)
+        if visited:
+            sys.stderr.write("\n")
+        log(f"backfilled {visited} rows")
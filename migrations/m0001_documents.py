@@ -0,0 +1,60 @@
+from sqlalchemy import text
+
+from db import AUTO_PK, DOCUMENT_TABLES, ITEM_TABLES, ensure_column, ensure_index
+
+# -----------------------
+# Baseline: documents, line items, change-probe counters
+# -----------------------
+# invoices and quotations share one column list; only the number column and
+# the invoice-only finalized-PDF hash differ.
+DOCUMENT_COLUMNS = """
+    customer_name VARCHAR(255),
+    customer_address TEXT,
+    items TEXT,
+    subtotal DECIMAL(12,2),
+    cgst_rate DECIMAL(6,2),
+    sgst_rate DECIMAL(6,2),
+    discount DECIMAL(12,2),
+    total DECIMAL(12,2),
+    company_name VARCHAR(255),
+    company_address TEXT,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP"""
+EXTRA_COLUMNS = {"invoices": {"pdf_sha256": "CHAR(64)"}, "quotations": {}}
+
+def upgrade(conn):
+    for table, number_field in DOCUMENT_TABLES.items():
+        extra = "".join(f",\n    {column} {ddl}" for column, ddl in EXTRA_COLUMNS[table].items())
+        conn.execute(text(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                id {AUTO_PK},
+                {number_field} VARCHAR(64) UNIQUE,{DOCUMENT_COLUMNS}{extra}
+            )
+        """))
+        # tables created before a column existed
+        for column, ddl in EXTRA_COLUMNS[table].items():
+            ensure_column(conn, table, column, ddl)
+    for table, (items_table, fk) in ITEM_TABLES.items():
+        conn.execute(text(f"""
+            CREATE TABLE IF NOT EXISTS {items_table} (
+                id {AUTO_PK},
+                {fk} INT NOT NULL,
+                line_no INT NOT NULL,
+                description TEXT,
+                qty DECIMAL(12,3),
+                unit_price DECIMAL(12,2),
+                line_total DECIMAL(14,2),
+                FOREIGN KEY ({fk}) REFERENCES {table}(id) ON DELETE CASCADE
+            )
+        """))
+        ensure_index(conn, items_table, f"idx_{items_table}_doc", [fk, "line_no"])
+    # Per-table deletion counter; with MAX(id) it forms the change-probe version
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS table_state (
+            table_name VARCHAR(64) PRIMARY KEY,
+            deletions INT NOT NULL DEFAULT 0
+        )
+    """))
+    seeded = {r[0] for r in conn.execute(text("SELECT table_name FROM table_state"))}
+    for table in DOCUMENT_TABLES:
+        if table not in seeded:
+            conn.execute(text("INSERT INTO table_state (table_name, deletions) VALUES (:t, 0)"), {"t": table})
@@ -0,0 +1,8 @@
+from migrations import schedule_backfill
+
+# -----------------------
+# Items stored as str(list) TEXT -> invoice_items / quotation_items
+# -----------------------
+# Done by the legacy_items backfill (db.migrate_legacy_rows), a batch at a time.
+def upgrade(conn):
+    schedule_backfill(conn, "legacy_items")
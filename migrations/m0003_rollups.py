@@ -0,0 +1,14 @@
+from sqlalchemy import inspect
+
+import rollups
+from migrations import schedule_backfill
+
+# -----------------------
+# Revenue rollups (rollups.py)
+# -----------------------
+# Filled from the document tables by the rollups backfill the first time they appear.
+def upgrade(conn):
+    new = not inspect(conn).has_table("revenue_daily")
+    rollups.create_tables(conn)
+    if new:
+        schedule_backfill(conn, "rollups")
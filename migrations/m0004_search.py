@@ -0,0 +1,10 @@
+import search
+from migrations import schedule_backfill
+
+# -----------------------
+# Full-text search index and customer names (search.py)
+# -----------------------
+# FTS5 on SQLite, a FULLTEXT table on MySQL; search.create_tables picks.
+def upgrade(conn):
+    if search.create_tables(conn):
+        schedule_backfill(conn, "search")
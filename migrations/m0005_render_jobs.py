@@ -0,0 +1,7 @@
+import render_queue
+
+# -----------------------
+# Persisted PDF render jobs (render_queue.RenderQueue drains them)
+# -----------------------
+def upgrade(conn):
+    render_queue.create_table(conn)
@@ -0,0 +1,7 @@
+import numbering
+
+# -----------------------
+# Server-side document number series (numbering.next_number)
+# -----------------------
+def upgrade(conn):
+    numbering.create_tables(conn)
@@ -0,0 +1,24 @@
+from sqlalchemy import text
+
+from db import DOCUMENT_TABLES, ensure_index
+
+# -----------------------
+# Indexes for the document queries
+# -----------------------
+#   idx_<table>_history    history grid: keyset order on created_at, covering the columns it shows
+#   idx_<table>_customer   statements and per-customer lookups: one customer's period in date order
+# Document numbers are already indexed by their UNIQUE keys. The planner
+# statistics are refreshed afterwards so the new indexes get picked up.
+def _add_indexes(conn):
+    for table, number_field in DOCUMENT_TABLES.items():
+        ensure_index(conn, table, f"idx_{table}_history",
+                     ["created_at", "id", number_field, "customer_name", "total"])
+        ensure_index(conn, table, f"idx_{table}_customer", ["customer_name", "created_at", "id", "total"])
+
+def upgrade_sqlite(conn):
+    _add_indexes(conn)
+    conn.execute(text("ANALYZE"))
+
+def upgrade_mysql(conn):
+    _add_indexes(conn)
+    conn.execute(text(f"ANALYZE TABLE {', '.join(DOCUMENT_TABLES)}"))
@@ -0,0 +1,196 @@
+import os
+import sys
+import atexit
+import socket
+import argparse
+import datetime
+import threading
+from sqlalchemy import text, bindparam
+
+# -----------------------
+# Document number series
+# -----------------------
+# Numbers are handed out server-side from number_sequences, one row per series
+# and period. A process reserves NUMBER_BLOCK_SIZE numbers in one short
+# transaction and then allocates from memory, so saving a document takes no
+# database lock for its number. Every reserved block is recorded in
+# number_blocks; numbers a block never used (the process stopped, the insert
+# failed) are the only possible gaps and audit() lists them. On a clean exit
+# the unused tail of a block is given back when nobody reserved after it.
+#
+# Formats use {fy} (financial year, "2026-27"), {year} and {seq}; a series
+# whose format has {fy} restarts at 1 every April, one with {year} every January.
+SERIES_FORMATS = {
+    "invoices": os.getenv("INVOICE_NUMBER_FORMAT", "YCIS/{fy}/{seq:06d}"),
+    "quotations": os.getenv("QUOTATION_NUMBER_FORMAT", "YCIS/Q/{fy}/{seq:06d}"),
+}
+NUMBER_BLOCK_SIZE = int(os.getenv("NUMBER_BLOCK_SIZE", "10"))
+AUDIT_BATCH = 1000
+
+def create_tables(conn):
+    from db import AUTO_PK, ensure_index
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS number_sequences (
+            series VARCHAR(32) NOT NULL,
+            period VARCHAR(16) NOT NULL,
+            next_value BIGINT NOT NULL,
+            PRIMARY KEY (series, period)
+        )
+    """))
+    conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS number_blocks (
+            id {AUTO_PK},
+            series VARCHAR(32) NOT NULL,
+            period VARCHAR(16) NOT NULL,
+            number_format VARCHAR(64) NOT NULL,
+            first_value BIGINT NOT NULL,
+            last_value BIGINT NOT NULL,
+            reserved_by VARCHAR(128),
+            reserved_at DATETIME NOT NULL
+        )
+    """))
+    ensure_index(conn, "number_blocks", "idx_number_blocks_series", ["series", "period", "first_value"])
+
+def financial_year(day: datetime.date) -> str:
+    """'2026-27' for any day from 1 April 2026 to 31 March 2027"""
+    start = day.year if day.month >= 4 else day.year - 1
+    return f"{start}-{(start + 1) % 100:02d}"
+
+def period_for(number_format: str, day: datetime.date) -> str:
+    """Key the sequence restarts on: the financial year, the calendar year, or never"""
+    if "{fy" in number_format:
+        return financial_year(day)
+    if "{year" in number_format:
+        return str(day.year)
+    return "-"
+
+def format_number(number_format: str, period: str, seq: int) -> str:
+    fy = period if "-" in period[1:] else ""
+    year = period if period.isdigit() else period[:4]
+    return number_format.format(fy=fy, year=year, seq=seq)
+
+
+class NumberAllocator:
+    """Per-process allocator handing out numbers from reserved blocks"""
+
+    def __init__(self, block_size: int = NUMBER_BLOCK_SIZE):
+        self.block_size = block_size
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._lock = threading.Lock()
+        self._blocks = {}       # (series, period) -> [next, last, block id, format]
+
+    def next_number(self, table: str, day: datetime.date = None) -> str:
+        """Allocate the next number of a document table's series"""
+        number_format = SERIES_FORMATS[table]
+        period = period_for(number_format, day or datetime.date.today())
+        with self._lock:
+            block = self._blocks.get((table, period))
+            if block is None or block[0] > block[1] or block[3] != number_format:
+                block = self._blocks[(table, period)] = self._reserve(table, period, number_format)
+            seq = block[0]
+            block[0] += 1
+        return format_number(number_format, period, seq)
+
+    def _reserve(self, series: str, period: str, number_format: str) -> list:
+        from db import engine
+        n = self.block_size
+        with engine.begin() as conn:
+            if conn.dialect.name == "sqlite":
+                upsert = "ON CONFLICT (series, period) DO UPDATE SET next_value = next_value + :n"
+            else:
+                upsert = "ON DUPLICATE KEY UPDATE next_value = next_value + :n"
+            # the upsert row-locks the sequence until commit, so the value read back is ours
+            conn.execute(text(f"INSERT INTO number_sequences (series, period, next_value) VALUES (:s, :p, 1 + :n) {upsert}"),
+                         {"s": series, "p": period, "n": n})
+            end = conn.execute(text("SELECT next_value FROM number_sequences WHERE series = :s AND period = :p"),
+                               {"s": series, "p": period}).scalar()
+            block_id = conn.execute(text("""
+                INSERT INTO number_blocks (series, period, number_format, first_value, last_value, reserved_by, reserved_at)
+                VALUES (:s, :p, :f, :first, :last, :owner, :now)
+            """), {"s": series, "p": period, "f": number_format, "first": end - n, "last": end - 1,
+                   "owner": self.owner, "now": datetime.datetime.now().replace(microsecond=0)}).lastrowid
+        return [end - n, end - 1, block_id, number_format]
+
+    def release(self):
+        """Give back the unused tail of each block if no later block was reserved (clean shutdown)"""
+        with self._lock:
+            blocks, self._blocks = self._blocks, {}
+        if not blocks:
+            return
+        from db import engine
+        for (series, period), (nxt, last, block_id, _) in blocks.items():
+            if nxt > last:
+                continue
+            try:
+                with engine.begin() as conn:
+                    given_back = conn.execute(text("""
+                        UPDATE number_sequences SET next_value = :nxt
+                        WHERE series = :s AND period = :p AND next_value = :end
+                    """), {"nxt": nxt, "s": series, "p": period, "end": last + 1}).rowcount
+                    if given_back:
+                        conn.execute(text("UPDATE number_blocks SET last_value = :last WHERE id = :id"),
+                                     {"last": nxt - 1, "id": block_id})
+            except Exception:
+                pass    # best effort; audit() reports whatever stays unused
+
+
+allocator = NumberAllocator()
+atexit.register(allocator.release)
+
+def next_number(table: str, day: datetime.date = None) -> str:
+    return allocator.next_number(table, day)
+
+# -----------------------
+# Gap audit
+# -----------------------
+def audit(table: str = None, period: str = None) -> list:
+    """Reserved numbers no document carries, oldest first.
+
+    A block still held by a running process shows its not-yet-used numbers too."""
+    from db import engine, DOCUMENT_TABLES
+    sql = "SELECT * FROM number_blocks WHERE first_value <= last_value"
+    params = {}
+    if table:
+        sql += " AND series = :s"
+        params["s"] = table
+    if period:
+        sql += " AND period = :p"
+        params["p"] = period
+    gaps = []
+    with engine.connect() as conn:
+        blocks = conn.execute(text(sql + " ORDER BY series, period, first_value"), params).mappings().all()
+        for block in blocks:
+            number_field = DOCUMENT_TABLES[block["series"]]
+            wanted = {format_number(block["number_format"], block["period"], seq): seq
+                      for seq in range(block["first_value"], block["last_value"] + 1)}
+            lookup = text(f"SELECT {number_field} FROM {block['series']} WHERE {number_field} IN :numbers"
+                          ).bindparams(bindparam("numbers", expanding=True))
+            found = set()
+            numbers = list(wanted)
+            for i in range(0, len(numbers), AUDIT_BATCH):
+                found.update(n for (n,) in conn.execute(lookup, {"numbers": numbers[i:i + AUDIT_BATCH]}))
+            gaps.extend({"series": block["series"], "period": block["period"], "seq": seq, "number": number,
+                         "reserved_by": block["reserved_by"], "reserved_at": str(block["reserved_at"])}
+                        for number, seq in wanted.items() if number not in found)
+    return gaps
+
+# -----------------------
+# CLI
+# -----------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Document number series")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_audit = sub.add_parser("audit", help="list reserved numbers that no document carries")
+    p_audit.add_argument("--table", choices=sorted(SERIES_FORMATS))
+    p_audit.add_argument("--period", help="e.g. 2026-27")
+    args = parser.parse_args(argv)
+    from db import init_db
+    init_db()
+    gaps = audit(args.table, args.period)
+    for gap in gaps:
+        print(f"{gap['number']}\treserved by {gap['reserved_by']} at {gap['reserved_at']}")
+    sys.stderr.write(f"{len(gaps)} unused numbers\n")
+    return 1 if gaps else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+import os
+import json
+import datetime
+import threading
+from hashlib import sha256
+from collections import OrderedDict
+
+# -----------------------
+# Rendered PDF cache (process-wide, shared by all sessions)
+# -----------------------
+PDF_CACHE_MAX_BYTES = int(os.getenv("PDF_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+DEFAULT_LOGO_PATH = "Logo.jpg"
+
+_logo_digests = {}
+_logo_lock = threading.Lock()
+
+
+def logo_fingerprint(logo_path: str) -> str:
+    """sha256 of the logo file, recomputed only when its mtime or size changes"""
+    try:
+        st = os.stat(logo_path)
+    except OSError:
+        return "missing"
+    stamp = (st.st_mtime_ns, st.st_size)
+    with _logo_lock:
+        cached = _logo_digests.get(logo_path)
+        if cached and cached[0] == stamp:
+            return cached[1]
+    with open(logo_path, "rb") as fh:
+        digest = sha256(fh.read()).hexdigest()
+    with _logo_lock:
+        _logo_digests[logo_path] = (stamp, digest)
+    return digest
+
+
+def cache_key(values: dict, items: list, template_version: str) -> str:
+    """Content hash of everything that ends up on the rendered page"""
+    values = dict(values)
+    # pdf_gen stamps today's date when none is given, so the key has to follow it
+    values.setdefault("doc_date", datetime.datetime.now().strftime('%d/%m/%Y'))
+    logo_path = values.get("logo_path", DEFAULT_LOGO_PATH)
+    payload = json.dumps({
+        "values": values,
+        "items": [[str(d), str(q), str(p)] for d, q, p in items],
+        "logo": logo_fingerprint(logo_path),
+        "template": template_version,
+    }, sort_keys=True, default=str)
+    return sha256(payload.encode()).hexdigest()
+
+
+class PDFCache:
+    """Byte-capped LRU of rendered PDFs, indexed by (table, document number)
+    so that a delete can drop every variant rendered for that document."""
+
+    def __init__(self, max_bytes: int = PDF_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()   # key -> (doc, pdf bytes)
+        self._by_doc = {}               # (table, number) -> {key, ...}
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, doc, data: bytes):
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (doc, data)
+            self._by_doc.setdefault(doc, set()).add(key)
+            self._size += len(data)
+            while self._size > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+
+    def invalidate(self, table: str, number):
+        with self._lock:
+            for key in list(self._by_doc.get((table, str(number)), ())):
+                self._drop(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_doc.clear()
+            self._size = 0
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._size,
+                    "max_bytes": self.max_bytes, "hits": self.hits, "misses": self.misses}
+
+    def _drop(self, key):
+        doc, data = self._entries.pop(key)
+        self._size -= len(data)
+        keys = self._by_doc.get(doc)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_doc[doc]
+
+
+pdf_cache = PDFCache()
+
+
+def get_or_render(table: str, number, values: dict, items: list, render, template_version: str):
+    """Return cached PDF bytes for this document content, rendering on a miss"""
+    key = cache_key(values, items, template_version)
+    data = pdf_cache.get(key)
+    if data is None:
+        data = render(values, items)
+        pdf_cache.put(key, (table, str(number)), data)
+    return data
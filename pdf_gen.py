@@ -1,6 +1,11 @@
+import copy
 import datetime
 import os
+import threading
 from io import BytesIO
+from decimal import Decimal
+from types import MappingProxyType
+from PIL import Image as PILImage
 from reportlab.lib.pagesizes import A4
 from reportlab.lib import colors
 from reportlab.lib.units import mm
@@ -12,6 +17,16 @@ from reportlab.lib.enums import TA_LEFT, TA_RIGHT, TA_CENTER
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+from reportlab import rl_config
+from totals import compute_totals, line_total, totals_from_subtotal
+from tracing import traced, span
+
+# Embed image streams as binary; ASCII85 runs in pure Python and dominates render time
+rl_config.useA85 = 0
+
+# Bump whenever the rendered layout changes so cached PDFs are not reused
+TEMPLATE_VERSION = "4"
 
 # --------------------------
 # Font Registration
@@ -24,7 +39,18 @@ def register_fonts():
     except Exception:
         return {'regular': "Helvetica", 'bold': "Helvetica-Bold"}
 
-FONTS = register_fonts()
+_fonts = None
+_fonts_lock = threading.Lock()
+
+
+def fonts():
+    """Registered font names; fonts are registered once per process, on first use"""
+    global _fonts
+    if _fonts is None:
+        with _fonts_lock:
+            if _fonts is None:
+                _fonts = register_fonts()
+    return _fonts
 
 # --------------------------
 # Color Scheme
@@ -42,14 +68,15 @@ class ModernStyles:
     @staticmethod
     def get_styles():
         styles = {}
-        styles['invoice_title'] = ParagraphStyle('invoice_title', fontName=FONTS['bold'], fontSize=18, leading=22, textColor=InvoiceColors.PRIMARY, alignment=TA_CENTER)
-        styles['company_name'] = ParagraphStyle('company_name', fontName=FONTS['bold'], fontSize=20, leading=24, textColor=InvoiceColors.PRIMARY, alignment=TA_LEFT)
-        styles['company_tagline'] = ParagraphStyle('company_tagline', fontName=FONTS['bold'], fontSize=12, leading=14, textColor=InvoiceColors.PRIMARY, alignment=TA_LEFT)
-        styles['doc_info'] = ParagraphStyle('doc_info', fontName=FONTS['regular'], fontSize=10, leading=12, textColor=InvoiceColors.TEXT, alignment=TA_RIGHT)
-        styles['To,'] = ParagraphStyle('To,', fontName=FONTS['regular'], fontSize=11, leading=14, textColor=InvoiceColors.TEXT)
-        styles['normal'] = ParagraphStyle('normal', fontName=FONTS['regular'], fontSize=10, leading=12, textColor=InvoiceColors.TEXT)
-        styles['bold'] = ParagraphStyle('bold', fontName=FONTS['bold'], fontSize=10, leading=12, textColor=InvoiceColors.TEXT)
-        styles['terms'] = ParagraphStyle('terms', fontName=FONTS['regular'], fontSize=10, leading=13, textColor=InvoiceColors.TEXT)
+        font = fonts()
+        styles['invoice_title'] = ParagraphStyle('invoice_title', fontName=font['bold'], fontSize=18, leading=22, textColor=InvoiceColors.PRIMARY, alignment=TA_CENTER)
+        styles['company_name'] = ParagraphStyle('company_name', fontName=font['bold'], fontSize=20, leading=24, textColor=InvoiceColors.PRIMARY, alignment=TA_LEFT)
+        styles['company_tagline'] = ParagraphStyle('company_tagline', fontName=font['bold'], fontSize=12, leading=14, textColor=InvoiceColors.PRIMARY, alignment=TA_LEFT)
+        styles['doc_info'] = ParagraphStyle('doc_info', fontName=font['regular'], fontSize=10, leading=12, textColor=InvoiceColors.TEXT, alignment=TA_RIGHT)
+        styles['To,'] = ParagraphStyle('To,', fontName=font['regular'], fontSize=11, leading=14, textColor=InvoiceColors.TEXT)
+        styles['normal'] = ParagraphStyle('normal', fontName=font['regular'], fontSize=10, leading=12, textColor=InvoiceColors.TEXT)
+        styles['bold'] = ParagraphStyle('bold', fontName=font['bold'], fontSize=10, leading=12, textColor=InvoiceColors.TEXT)
+        styles['terms'] = ParagraphStyle('terms', fontName=font['regular'], fontSize=10, leading=13, textColor=InvoiceColors.TEXT)
         return styles
 
 # --------------------------
@@ -101,59 +128,182 @@ def number_to_words(amount):
     return result.strip().title()
 
 # --------------------------
-# Logo Handler
+# Precompiled Template
 # --------------------------
-def add_logo(logo_path, max_width=80, max_height=80):
-    try:
+TERMS_TEXT = """
+    <b>Terms and Conditions:</b><br/>
+•	These terms remain binding unless otherwise agreed in writing under a Service Level Agreement (SLA) or other executed agreement.<br/>
+•	Payments must be made within the agreed terms from the invoice date.<br/>
+•	Delayed payments will attract interest at 2% per month until realization.<br/>
+•	Back-to-back payment terms are acceptable only if mutually agreed in writing.<br/>
+•	All payments shall be made in Indian Rupees (INR) in favor of YCIS Data Center.<br/>
+•	Any dispute regarding invoice amount, services, or products must be raised in writing within 7 days of receipt.<br/>
+•	No claims will be entertained after this period.<br/>
+•	If a Proforma Invoice is issued, it will automatically convert into a Tax Invoice and be binding if no objection is raised within 7 days of receipt.<br/>
+•	Services may be suspended, discontinued, or terminated in case of non-payment.<br/>
+•	Suspension or termination of services due to non-payment shall not be considered a breach of SLA.<br/>
+•	Suspended services will resume only after full settlement of all outstanding dues.<br/>
+•	YCIS Data Center will not be liable for any loss or damage caused due to service suspension, degradation, termination, or client-side issues.<br/>
+•	Timely payment is essential to ensure uninterrupted services and enables YCIS Data Center to maintain infrastructure and resources.<br/>
+
+    """
+
+# Width the platypus frame gives flowables: A4 minus 20mm margins and 6pt frame padding
+FRAME_WIDTH = A4[0] - 40*mm - 12
+WATERMARK_SIZE = 200
+WATERMARK_FORM = "ycisWatermark"
+
+
+class PrewrappedParagraph(Paragraph):
+    """Paragraph that keeps its line breaks while the available width is unchanged"""
+    def wrap(self, availWidth, availHeight):
+        if getattr(self, '_wrapped_width', None) == availWidth:
+            return self.width, self.height
+        w, h = Paragraph.wrap(self, availWidth, availHeight)
+        self._wrapped_width = availWidth
+        return w, h
+
+
+def _prescale_image(path, box_w, box_h, oversample=3, keep_aspect=True):
+    """Decode an image once and return JPEG bytes sized for its drawn box.
+
+    JPEG data is embedded by ReportLab as-is, so later renders skip decoding entirely."""
+    with PILImage.open(path) as im:
+        if im.mode in ("RGBA", "LA"):
+            bg = PILImage.new("RGB", im.size, (255,255,255))
+            bg.paste(im, mask=im.split()[-1])
+            im = bg
+        elif im.mode != "RGB":
+            im = im.convert("RGB")
+        w, h = im.size
+        scale = min(box_w / w, box_h / h) if keep_aspect else 1
+        draw_w, draw_h = (w * scale, h * scale) if keep_aspect else (box_w, box_h)
+        px = (max(1, min(w, int(draw_w * oversample))), max(1, min(h, int(draw_h * oversample))))
+        bio = BytesIO()
+        im.resize(px, PILImage.Resampling.LANCZOS).save(bio, format="JPEG", quality=90)
+        return bio.getvalue(), draw_w, draw_h
+
+
+class InvoiceTemplate:
+    """Static parts of the invoice, built once per process and shared by every render.
+
+    Holds the pre-scaled logo and watermark bytes, frozen paragraph styles and the
+    laid-out terms page; each render only lays out its own dynamic content."""
+
+    def __init__(self, logo_path):
+        self.logo_path = logo_path
+        self.styles = MappingProxyType(ModernStyles.get_styles())
+        self.logo_jpeg = None
+        self.logo_size = (0, 0)
+        self.watermark_jpeg = None
         if os.path.exists(logo_path):
-            img = Image(logo_path)
-            scale = min(max_width / img.imageWidth, max_height / img.imageHeight)
-            img.drawWidth = img.imageWidth * scale
-            img.drawHeight = img.imageHeight * scale
-            return img
-    except Exception as e:
-        print(f"Could not load logo: {e}")
-    return None
+            try:
+                self.logo_jpeg, lw, lh = _prescale_image(logo_path, 80, 80)
+                self.logo_size = (lw, lh)
+            except Exception as e:
+                print(f"Could not load logo: {e}")
+            try:
+                self.watermark_jpeg, _, _ = _prescale_image(logo_path, WATERMARK_SIZE, WATERMARK_SIZE, oversample=2, keep_aspect=False)
+            except Exception as e:
+                print(f"Watermark error: {e}")
+        self.terms = PrewrappedParagraph(TERMS_TEXT, self.styles['terms'])
+        self.terms.wrap(FRAME_WIDTH, A4[1])
 
-# --------------------------
-# Watermark
-# --------------------------
-def watermark(canvas_obj, doc, logo_path):
-    if os.path.exists(logo_path):
-        try:
-            img = ImageReader(logo_path)
+    def logo_flowable(self):
+        if self.logo_jpeg is None:
+            return None
+        return Image(BytesIO(self.logo_jpeg), width=self.logo_size[0], height=self.logo_size[1])
+
+    def terms_flowable(self):
+        # shallow copy shares the parsed fragments and line breaks, not the draw state
+        return copy.copy(self.terms)
+
+    def draw_watermark(self, canvas_obj):
+        """Draw the faded logo from one form XObject per document.
+
+        ReportLab forms carry no ExtGState resources of their own, so the alpha is
+        set around the form invocation rather than inside it."""
+        if self.watermark_jpeg is None:
+            return
+        if getattr(canvas_obj, '_watermark_form', None) != id(self):
             page_width, page_height = A4
-            img_width, img_height = 200, 200
-            x = (page_width - img_width) / 2
-            y = (page_height - img_height) / 2
-            canvas_obj.saveState()
-            canvas_obj.setFillAlpha(0.1)
-            canvas_obj.drawImage(img, x, y, width=img_width, height=img_height, mask='auto')
-            canvas_obj.restoreState()
-        except Exception as e:
-            print(f"Watermark error: {e}")
+            x = (page_width - WATERMARK_SIZE) / 2
+            y = (page_height - WATERMARK_SIZE) / 2
+            canvas_obj.beginForm(WATERMARK_FORM)
+            # a fresh reader per document: readers share a file position and are not thread-safe
+            canvas_obj.drawImage(ImageReader(BytesIO(self.watermark_jpeg)), x, y, width=WATERMARK_SIZE, height=WATERMARK_SIZE, mask='auto')
+            canvas_obj.endForm()
+            canvas_obj._watermark_form = id(self)
+        canvas_obj.saveState()
+        canvas_obj.setFillAlpha(0.1)
+        canvas_obj.doForm(WATERMARK_FORM)
+        canvas_obj.restoreState()
+
+
+_templates = {}
+_templates_lock = threading.Lock()
+
+
+def get_template(logo_path='Logo.jpg'):
+    """Process-wide InvoiceTemplate, rebuilt only if the logo file changes"""
+    try:
+        st = os.stat(logo_path)
+        stamp = (st.st_mtime_ns, st.st_size)
+    except OSError:
+        stamp = None
+    with _templates_lock:
+        cached = _templates.get(logo_path)
+        if cached and cached[0] == stamp:
+            return cached[1]
+        template = InvoiceTemplate(logo_path)
+        _templates[logo_path] = (stamp, template)
+        return template
 
 # --------------------------
-# PDF Generator
+# Shared page parts
 # --------------------------
-def generate_simple_invoice_pdf(values: dict, items: list):
-    buffer = BytesIO()
-    logo_path = values.get('logo_path', 'Logo.jpg')
-    doc = SimpleDocTemplate(buffer, pagesize=A4, leftMargin=20*mm, rightMargin=20*mm, topMargin=20*mm, bottomMargin=20*mm)
+ITEM_COL_WIDTHS = [30, 220, 40, 70, 90]
+ITEM_HEADER = ["No", "Item Description", "Qty", "Price", "Total"]
+ITEM_TABLE_STYLE = [
+    ('BACKGROUND',(0,0),(-1,0),InvoiceColors.PRIMARY),
+    ('TEXTCOLOR',(0,0),(-1,0),InvoiceColors.WHITE),
+
+    # Alignments
+    ('ALIGN',(0,0),(0,-1),'CENTER'),   # Sr No
+    ('ALIGN',(1,0),(1,-1),'LEFT'),     # Item Description
+    ('ALIGN',(2,0),(2,-1),'CENTER'),   # Qty
+    ('ALIGN',(3,0),(3,-1),'CENTER'),   # Price
+    ('ALIGN',(4,0),(4,-1),'CENTER'),   # Total
+
+    # Vertical alignment fix
+    ('VALIGN',(0,0),(-1,-1),'MIDDLE'),
+
+    # Borders
+    ('BOX',(0,0),(-1,-1),1,InvoiceColors.BORDER),
+    ('INNERGRID',(0,0),(-1,-1),0.5,InvoiceColors.BORDER),
+]
+
+
+def header_flowables(values: dict, template, title: str = "INVOICE", info: str = None):
+    """Title, logo + company, invoice number/date (or `info`) and the customer block"""
+    styles = template.styles
     story = []
-    styles = ModernStyles.get_styles()
 
     # Title
-    story.append(Paragraph("INVOICE", styles['invoice_title']))
+    story.append(Paragraph(title, styles['invoice_title']))
     story.append(Spacer(1, 10))
 
     # Logo + Company
     company_name = values.get('company_name', 'Data Center')
     company_tagline = "Yashavantrao Chavan Institute of Science, Satara."
-    logo = add_logo(logo_path)
+    logo = template.logo_flowable()
     if logo:
         header_table = Table([[logo, Spacer(1,5), Paragraph(f"<b>{company_name}</b><br/>{company_tagline}", styles['company_tagline'])]], colWidths=[80,10,350])
-        header_table.setStyle(TableStyle([('VALIGN',(0,0),(-1,-1),'MIDDLE')]))
+        header_table.setStyle(TableStyle([
+            ('VALIGN',(0,0),(-1,-1),'MIDDLE'),
+            ('LEFTPADDING',(0,0),(1,0),0),
+            ('RIGHTPADDING',(0,0),(1,0),0),
+        ]))
         story.append(header_table)
     else:
         story.append(Paragraph(f"<b>{company_name}</b>", styles['company_name']))
@@ -161,9 +311,11 @@ def generate_simple_invoice_pdf(values: dict, items: list):
     story.append(Spacer(1, 10))
 
     # Invoice info
-    doc_number = values.get('doc_number','INV-001')
-    doc_date = values.get('doc_date', datetime.datetime.now().strftime('%d/%m/%Y'))
-    invoice_info = Table([['', Paragraph(f"<b>Invoice #:</b> {doc_number}<br/><b>Date:</b> {doc_date}", styles['doc_info'])]], colWidths=[350,120])
+    if info is None:
+        doc_number = values.get('doc_number','INV-001')
+        doc_date = values.get('doc_date', datetime.datetime.now().strftime('%d/%m/%Y'))
+        info = f"<b>Invoice #:</b> {doc_number}<br/><b>Date:</b> {doc_date}"
+    invoice_info = Table([['', Paragraph(info, styles['doc_info'])]], colWidths=[350,120])
     invoice_info.setStyle(TableStyle([('ALIGN',(1,0),(1,0),'RIGHT')]))
     story.append(invoice_info)
     story.append(Spacer(1, 15))
@@ -173,44 +325,19 @@ def generate_simple_invoice_pdf(values: dict, items: list):
     customer_address = values.get('customer_address','Customer Address')
     story.append(Paragraph(f"<b>To,</b><br/><b>{customer_name}</b><br/>{customer_address}", styles['To,']))
     story.append(Spacer(1, 15))
+    return story
 
-    # Items
-    table_data = [["No","Item Description","Qty","Price","Total"]]
-    subtotal = 0
-    for i,(desc,qty,rate) in enumerate(items,start=1):
-        total = qty*rate
-        subtotal += total
-        table_data.append([str(i), Paragraph(desc, styles['normal']), f"{qty:g}", f"{rate:,.2f}", f"{total:,.2f}"])
-    table = Table(table_data,colWidths=[30,220,40,70,90],repeatRows=1)
-    table.setStyle(TableStyle([
-        ('BACKGROUND',(0,0),(-1,0),InvoiceColors.PRIMARY),
-        ('TEXTCOLOR',(0,0),(-1,0),InvoiceColors.WHITE),
-
-        # Alignments
-        ('ALIGN',(0,0),(0,-1),'CENTER'),   # Sr No
-        ('ALIGN',(1,0),(1,-1),'LEFT'),     # Item Description
-        ('ALIGN',(2,0),(2,-1),'CENTER'),   # Qty
-        ('ALIGN',(3,0),(3,-1),'CENTER'),   # Price
-        ('ALIGN',(4,0),(4,-1),'CENTER'),   # Total
-
-        # Vertical alignment fix
-        ('VALIGN',(0,0),(-1,-1),'MIDDLE'),
-
-        # Borders
-        ('BOX',(0,0),(-1,-1),1,InvoiceColors.BORDER),
-        ('INNERGRID',(0,0),(-1,-1),0.5,InvoiceColors.BORDER),
-    ]))
-    story.append(table)
-    story.append(Spacer(1, 15))
 
-    # Totals
+def totals_flowables(values: dict, amounts: dict, styles):
+    """Totals table and amount in words"""
     cgst = float(values.get('cgst_rate',0))
     sgst = float(values.get('sgst_rate',0))
-    discount = float(values.get('discount',0))
-    cgst_amt = subtotal*cgst/100
-    sgst_amt = subtotal*sgst/100
-    total_tax = cgst_amt+sgst_amt
-    grand_total = subtotal+total_tax-discount
+    subtotal = amounts['subtotal']
+    cgst_amt = amounts['cgst']
+    sgst_amt = amounts['sgst']
+    discount = amounts['discount']
+    total_tax = amounts['tax']
+    grand_total = amounts['total']
 
     totals=[["Sub Total",f"{subtotal:,.2f}"]]
     if cgst>0: totals.append([f"CGST @ {cgst}%",f"{cgst_amt:,.2f}"])
@@ -221,47 +348,168 @@ def generate_simple_invoice_pdf(values: dict, items: list):
     totals_table.setStyle(TableStyle([
         ('ALIGN',(0,0),(0,-1),'LEFT'),
         ('ALIGN',(1,0),(1,-1),'RIGHT'),
-        ('FONTNAME',(0,-1),(-1,-1),FONTS['bold']),
+        ('FONTNAME',(0,-1),(-1,-1),fonts()['bold']),
         ('BOX',(0,0),(-1,-1),1,InvoiceColors.BORDER),
         ('INNERGRID',(0,0),(-1,-2),0.5,InvoiceColors.BORDER),
         ('VALIGN',(0,0),(-1,-1),'MIDDLE'),   # Vertical align totals table too
     ]))
-    story.append(totals_table)
-    story.append(Spacer(1, 10))
+    return [totals_table, Spacer(1, 10),
+            # Amount in words
+            Paragraph(f"<b>Amount in Words:</b> {number_to_words(grand_total)}", styles['bold'])]
 
-    # Amount in words
-    story.append(Paragraph(f"<b>Amount in Words:</b> {number_to_words(grand_total)}", styles['bold']))
-    story.append(PageBreak())
+# --------------------------
+# PDF Generator
+# --------------------------
+@traced("pdf.render")
+def generate_simple_invoice_pdf(values: dict, items: list):
+    buffer = BytesIO()
+    logo_path = values.get('logo_path', 'Logo.jpg')
+    doc = SimpleDocTemplate(buffer, pagesize=A4, leftMargin=20*mm, rightMargin=20*mm, topMargin=20*mm, bottomMargin=20*mm)
+    template = get_template(logo_path)
+    styles = template.styles
+    story = header_flowables(values, template)
 
-    # Terms on new page
-    terms_text = """
-    <b>Terms and Conditions:</b><br/>
-•	These terms remain binding unless otherwise agreed in writing under a Service Level Agreement (SLA) or other executed agreement.<br/>
-•	Payments must be made within the agreed terms from the invoice date.<br/>
-•	Delayed payments will attract interest at 2% per month until realization.<br/>
-•	Back-to-back payment terms are acceptable only if mutually agreed in writing.<br/>
-•	All payments shall be made in Indian Rupees (INR) in favor of YCIS Data Center.<br/>
-•	Any dispute regarding invoice amount, services, or products must be raised in writing within 7 days of receipt.<br/>
-•	No claims will be entertained after this period.<br/>
-•	If a Proforma Invoice is issued, it will automatically convert into a Tax Invoice and be binding if no objection is raised within 7 days of receipt.<br/>
-•	Services may be suspended, discontinued, or terminated in case of non-payment.<br/>
-•	Suspension or termination of services due to non-payment shall not be considered a breach of SLA.<br/>
-•	Suspended services will resume only after full settlement of all outstanding dues.<br/>
-•	YCIS Data Center will not be liable for any loss or damage caused due to service suspension, degradation, termination, or client-side issues.<br/>
-•	Timely payment is essential to ensure uninterrupted services and enables YCIS Data Center to maintain infrastructure and resources.<br/>
+    # Items
+    table_data = [ITEM_HEADER]
+    with span("pdf.items_table"):
+        amounts = compute_totals(items, values.get('cgst_rate',0), values.get('sgst_rate',0), values.get('discount',0))
+        for i,((desc,qty,rate),total) in enumerate(zip(items,amounts['lines']),start=1):
+            table_data.append([str(i), Paragraph(desc, styles['normal']), f"{qty:g}", f"{rate:,.2f}", f"{total:,.2f}"])
+    table = Table(table_data,colWidths=ITEM_COL_WIDTHS,repeatRows=1)
+    table.setStyle(TableStyle(ITEM_TABLE_STYLE))
+    story.append(table)
+    story.append(Spacer(1, 15))
 
-    """
-    story.append(Paragraph(terms_text, styles['terms']))
+    # Totals
+    story.extend(totals_flowables(values, amounts, styles))
+    story.append(PageBreak())
+
+    # Terms on new page (laid out once per process)
+    story.append(template.terms_flowable())
 
     def on_page(c, d):
-        watermark(c,d,logo_path)
+        template.draw_watermark(c)
 
-    doc.build(story,onFirstPage=on_page,onLaterPages=on_page)
+    with span("pdf.build"):
+        doc.build(story,onFirstPage=on_page,onLaterPages=on_page)
     buffer.seek(0)
     return buffer.getvalue()
 
+# --------------------------
+# Large documents (bounded memory)
+# --------------------------
+# One Table with a Paragraph per line makes ReportLab measure and re-split the
+# whole table on every page. Here items are pulled from any iterable one page
+# at a time into a fresh Table of plain string cells (a Paragraph only when a
+# description is wider than its column), drawn straight onto the canvas with
+# the running subtotal carried from page to page. Only the current page exists
+# as flowables; finished pages are kept by ReportLab as compressed streams.
+LARGE_DOCUMENT_ITEMS = 200          # generate_professional_pdf switches layout above this
+ROWS_PER_PAGE = 45
+FRAME_LEFT = 20*mm + 6
+FRAME_BOTTOM = 20*mm + 6
+FRAME_TOP = A4[1] - 20*mm - 6
+CELL_PADDING = 6                    # Table default: 3pt either side of the text
+
+
+def draw_flowables(c, flowables, y):
+    """Draw top-down from y inside the page frame; returns the new y"""
+    for f in flowables:
+        w, h = f.wrap(FRAME_WIDTH, y - FRAME_BOTTOM)
+        align = getattr(f, 'hAlign', 'LEFT')
+        x = FRAME_LEFT + (FRAME_WIDTH - w if align == 'RIGHT' else (FRAME_WIDTH - w) / 2 if align == 'CENTER' else 0)
+        f.drawOn(c, x, y - h)
+        y -= h
+    return y
+
+def flowables_height(flowables) -> float:
+    return sum(f.wrap(FRAME_WIDTH, A4[1])[1] for f in flowables)
+
+def description_cell(desc: str, style, plain_height: float):
+    """(cell, row height): a plain string unless the text needs wrapping"""
+    desc = str(desc)
+    if "\n" not in desc and pdfmetrics.stringWidth(desc, style.fontName, style.fontSize) <= ITEM_COL_WIDTHS[1] - 2 * CELL_PADDING:
+        return desc, plain_height
+    para = Paragraph(desc, style)
+    return para, max(plain_height, para.wrap(ITEM_COL_WIDTHS[1] - 2 * CELL_PADDING, A4[1])[1] + CELL_PADDING)
+
+def _forward_row(label: str, amount) -> list:
+    return [label, "", "", "", f"{amount:,.2f}"]
+
+@traced("pdf.render_large")
+def render_large_pdf(values: dict, items, out):
+    """Write the invoice for an iterable of (desc, qty, price) to `out` (a path or binary file).
+
+    Memory stays roughly flat in the number of items: rows are consumed lazily and
+    laid out a page at a time."""
+    template = get_template(values.get('logo_path', 'Logo.jpg'))
+    styles = template.styles
+    c = canvas.Canvas(out, pagesize=A4, pageCompression=1)
+    plain_height = Table([ITEM_HEADER], colWidths=ITEM_COL_WIDTHS).wrap(FRAME_WIDTH, A4[1])[1]
+    continued = [Paragraph(f"<b>Invoice #:</b> {values.get('doc_number','INV-001')} (continued)", styles['doc_info']),
+                 Spacer(1, 10)]
+    rows = iter(items)
+    pending = next(rows, None)      # one row of lookahead tells whether a page is the last
+    running = Decimal("0.00")
+    line_no = 0
+    page = 0
+    while True:
+        page += 1
+        template.draw_watermark(c)
+        y = draw_flowables(c, header_flowables(values, template) if page == 1 else continued, FRAME_TOP)
+        data = [ITEM_HEADER]
+        if page > 1:
+            data.append(_forward_row("Brought forward", running))
+        # room for the rows plus a carried-forward row
+        room = y - FRAME_BOTTOM - plain_height * (len(data) + 1)
+        count = 0
+        with span("pdf.items_page"):
+            while pending is not None and count < ROWS_PER_PAGE:
+                desc, qty, rate = pending
+                cell, height = description_cell(desc, styles['normal'], plain_height)
+                if height > room and count:
+                    break
+                room -= height
+                total = line_total(qty, rate)
+                running += total
+                line_no += 1
+                count += 1
+                data.append([str(line_no), cell, f"{qty:g}", f"{rate:,.2f}", f"{total:,.2f}"])
+                pending = next(rows, None)
+        if pending is not None:
+            data.append(_forward_row("Carried forward", running))
+        forward_style = []
+        for r in ([1] if page > 1 else []) + ([len(data) - 1] if pending is not None else []):
+            forward_style += [('SPAN',(0,r),(3,r)), ('ALIGN',(0,r),(3,r),'RIGHT'), ('FONTNAME',(0,r),(-1,r),fonts()['bold'])]
+        table = Table(data, colWidths=ITEM_COL_WIDTHS)
+        table.setStyle(TableStyle(ITEM_TABLE_STYLE + forward_style))
+        y = draw_flowables(c, [table, Spacer(1, 15)], y)
+        if pending is None:
+            break
+        c.showPage()
+
+    amounts = totals_from_subtotal(running, values.get('cgst_rate',0), values.get('sgst_rate',0), values.get('discount',0))
+    closing = totals_flowables(values, amounts, styles)
+    if flowables_height(closing) > y - FRAME_BOTTOM:
+        c.showPage()
+        template.draw_watermark(c)
+        y = draw_flowables(c, continued, FRAME_TOP)
+    draw_flowables(c, closing, y)
+    c.showPage()
+
+    # Terms on new page
+    template.draw_watermark(c)
+    draw_flowables(c, [template.terms_flowable()], FRAME_TOP)
+    c.showPage()
+    with span("pdf.save"):
+        c.save()
+
 # --------------------------
 # Backward Compatibility
 # --------------------------
 def generate_professional_pdf(values, items, doc_type="INVOICE"):
+    if len(items) > LARGE_DOCUMENT_ITEMS:
+        buffer = BytesIO()
+        render_large_pdf(values, items, buffer)
+        return buffer.getvalue()
     return generate_simple_invoice_pdf(values, items)
@@ -0,0 +1,133 @@
+import os
+import sys
+import mmap
+import argparse
+import tempfile
+from hashlib import sha256
+from sqlalchemy import text
+
+# -----------------------
+# Content-addressed store for finalized PDFs
+# -----------------------
+# An invoice is rendered once, when it is finalized. The bytes are written to
+# PDF_STORE_DIR/ab/cd/<sha256>.pdf and the digest is recorded in
+# invoices.pdf_sha256. Every later download is served from that file, so a
+# changed logo, font or terms text can never alter an issued invoice. Blobs are
+# never rewritten or deleted; `python pdf_store.py verify` rehashes them all.
+PDF_STORE_DIR = os.getenv("PDF_STORE_DIR", "pdf_store")
+FINALIZED_TABLES = {"invoices"}
+VERIFY_BATCH = 1000
+
+def blob_path(digest: str, root: str = None) -> str:
+    return os.path.join(root or PDF_STORE_DIR, digest[:2], digest[2:4], f"{digest}.pdf")
+
+def _digest_file(path: str) -> str:
+    with open(path, "rb") as fh:
+        if os.fstat(fh.fileno()).st_size == 0:
+            return sha256(b"").hexdigest()
+        with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return sha256(mm).hexdigest()
+
+def put(data: bytes, root: str = None) -> str:
+    """Store bytes under their sha256 (write-once, atomic); returns the digest"""
+    digest = sha256(data).hexdigest()
+    path = blob_path(digest, root)
+    if os.path.exists(path):
+        return digest
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(data)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return digest
+
+def read(digest: str, root: str = None) -> bytes:
+    """Stored PDF bytes, read through a memory map of the blob (no render)"""
+    with open(blob_path(digest, root), "rb") as fh, \
+            mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        return mm[:]
+
+def exists(digest: str, root: str = None) -> bool:
+    return bool(digest) and os.path.exists(blob_path(digest, root))
+
+def finalize(table: str, number, data: bytes) -> str:
+    """Store a rendered PDF and pin it to the document row; returns the digest in effect.
+
+    If another process finalized the document first, its digest wins and is returned."""
+    from db import engine, DOCUMENT_TABLES
+    digest = put(data)
+    with engine.begin() as conn:
+        conn.execute(text(
+            f"UPDATE {table} SET pdf_sha256 = :d WHERE {DOCUMENT_TABLES[table]} = :n AND pdf_sha256 IS NULL"
+        ), {"d": digest, "n": number})
+        stored = conn.execute(text(f"SELECT pdf_sha256 FROM {table} WHERE {DOCUMENT_TABLES[table]} = :n"),
+                              {"n": number}).scalar()
+    return stored or digest
+
+def stored_pdf(table: str, row):
+    """Finalized PDF bytes for a document row, or None when it has not been finalized"""
+    digest = row.get("pdf_sha256") if table in FINALIZED_TABLES else None
+    return read(digest) if exists(digest) else None
+
+# -----------------------
+# Integrity check
+# -----------------------
+def verify(table: str = "invoices", orphans: bool = False):
+    """Rehash every blob referenced from `table`.
+
+    Returns {"checked", "missing": [...], "corrupt": [...], "orphans": [...]}, where
+    the lists hold (number, digest) pairs; orphans are blobs nothing references."""
+    from db import engine, DOCUMENT_TABLES
+    number_field = DOCUMENT_TABLES[table]
+    report = {"checked": 0, "missing": [], "corrupt": [], "orphans": []}
+    referenced = set()
+    after = 0
+    while True:
+        with engine.connect() as conn:
+            rows = conn.execute(text(f"""
+                SELECT id, {number_field}, pdf_sha256 FROM {table}
+                WHERE pdf_sha256 IS NOT NULL AND id > :after ORDER BY id LIMIT :limit
+            """), {"after": after, "limit": VERIFY_BATCH}).all()
+        if not rows:
+            break
+        after = rows[-1][0]
+        for _, number, digest in rows:
+            report["checked"] += 1
+            referenced.add(digest)
+            path = blob_path(digest)
+            if not os.path.exists(path):
+                report["missing"].append((number, digest))
+            elif _digest_file(path) != digest:
+                report["corrupt"].append((number, digest))
+    if orphans and os.path.isdir(PDF_STORE_DIR):
+        for dirpath, _, files in os.walk(PDF_STORE_DIR):
+            for name in files:
+                if name.endswith(".pdf") and name[:-4] not in referenced:
+                    report["orphans"].append((None, name[:-4]))
+    return report
+
+# -----------------------
+# CLI
+# -----------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Content-addressed store of finalized invoice PDFs")
+    parser.add_argument("command", choices=["verify"])
+    parser.add_argument("--orphans", action="store_true", help="also list blobs no invoice references")
+    args = parser.parse_args(argv)
+    report = verify("invoices", orphans=args.orphans)
+    for kind in ("missing", "corrupt", "orphans"):
+        for number, digest in report[kind]:
+            print(f"{kind}: {digest}" + (f" ({number})" if number else ""))
+    print(f"Checked {report['checked']} invoice PDFs: {len(report['missing'])} missing, "
+          f"{len(report['corrupt'])} corrupt" + (f", {len(report['orphans'])} orphaned" if args.orphans else ""))
+    return 1 if report["missing"] or report["corrupt"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,218 @@
+import os
+import sys
+import time
+import socket
+import argparse
+import datetime
+import threading
+import traceback
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from sqlalchemy import text
+
+import pdf_store
+from pdf_cache import pdf_cache, cache_key
+import tracing
+
+# -----------------------
+# Persisted PDF render queue
+# -----------------------
+# enqueue() adds a render_jobs row in the caller's transaction, so a job exists
+# exactly when its document committed. RenderQueue threads claim jobs with a
+# conditional UPDATE (safe with several processes on one database) and render on
+# a process pool, so the Streamlit thread that saved the document returns at once.
+# Failures are retried with backoff. A job left 'running' by a process that died
+# is claimed again once its lease runs out, so a restart loses nothing.
+# Invoices are finalized into pdf_store; other documents go to pdf_cache.
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", "0")) or os.cpu_count() or 1
+MAX_ATTEMPTS = 3
+RETRY_SECONDS = 5        # doubled after every failed attempt
+LEASE_SECONDS = 120      # a 'running' job older than this is assumed orphaned
+POLL_SECONDS = 5         # idle workers also look for jobs queued by other processes
+
+def create_table(conn):
+    from db import AUTO_PK, ensure_index
+    conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS render_jobs (
+            id {AUTO_PK},
+            doc_type VARCHAR(16) NOT NULL,
+            doc_number VARCHAR(64) NOT NULL,
+            status VARCHAR(16) NOT NULL DEFAULT 'pending',
+            attempts INT NOT NULL DEFAULT 0,
+            next_attempt_at DATETIME NOT NULL,
+            claimed_by VARCHAR(128),
+            claimed_at DATETIME,
+            cache_key VARCHAR(64),
+            last_error TEXT,
+            created_at DATETIME NOT NULL,
+            finished_at DATETIME
+        )
+    """))
+    ensure_index(conn, "render_jobs", "idx_render_jobs_queue", ["status", "next_attempt_at"])
+    ensure_index(conn, "render_jobs", "idx_render_jobs_doc", ["doc_type", "doc_number"])
+
+def _now():
+    return datetime.datetime.now().replace(microsecond=0)
+
+def enqueue(conn, table: str, number) -> int:
+    """Queue a render of one document in the caller's transaction; returns the job id"""
+    now = _now()
+    return conn.execute(text("""
+        INSERT INTO render_jobs (doc_type, doc_number, status, attempts, next_attempt_at, created_at)
+        VALUES (:t, :n, 'pending', 0, :now, :now)
+    """), {"t": table, "n": str(number), "now": now}).lastrowid
+
+def job_status(table: str, number):
+    """Latest render job for a document as a mapping, or None"""
+    from db import engine
+    with engine.connect() as conn:
+        return conn.execute(text(
+            "SELECT * FROM render_jobs WHERE doc_type = :t AND doc_number = :n ORDER BY id DESC LIMIT 1"
+        ), {"t": table, "n": str(number)}).mappings().first()
+
+def retry(job_id: int):
+    """Put a failed job back in the queue with a fresh set of attempts"""
+    from db import engine
+    with engine.begin() as conn:
+        conn.execute(text("""
+            UPDATE render_jobs SET status = 'pending', attempts = 0, next_attempt_at = :now, last_error = NULL
+            WHERE id = :id AND status = 'failed'
+        """), {"id": job_id, "now": _now()})
+
+def claim(owner: str):
+    """Take the oldest runnable job (due pending, or running with an expired lease); None when idle"""
+    from db import engine
+    while True:
+        now = _now()
+        with engine.begin() as conn:
+            job = conn.execute(text("""
+                SELECT id, status FROM render_jobs
+                WHERE (status = 'pending' AND next_attempt_at <= :now) OR (status = 'running' AND claimed_at < :stale)
+                ORDER BY id LIMIT 1
+            """), {"now": now, "stale": now - datetime.timedelta(seconds=LEASE_SECONDS)}).first()
+            if job is None:
+                return None
+            # only one claimer can win the status/claimed_at it just read
+            won = conn.execute(text("""
+                UPDATE render_jobs SET status = 'running', claimed_by = :owner, claimed_at = :now,
+                       attempts = attempts + 1
+                WHERE id = :id AND status = :status
+                  AND (status = 'pending' OR claimed_at < :stale)
+            """), {"id": job.id, "status": job.status, "owner": owner, "now": now,
+                   "stale": now - datetime.timedelta(seconds=LEASE_SECONDS)}).rowcount
+            if won:
+                return conn.execute(text("SELECT * FROM render_jobs WHERE id = :id"), {"id": job.id}).mappings().first()
+
+def _finish(job_id: int, **fields):
+    from db import engine
+    fields["finished_at"] = _now() if fields.get("status") in ("done", "failed") else None
+    with engine.begin() as conn:
+        conn.execute(text(f"UPDATE render_jobs SET {', '.join(f'{k} = :{k}' for k in fields)} WHERE id = :id"),
+                     dict(fields, id=job_id))
+
+
+class RenderQueue:
+    """Worker threads draining render_jobs onto a process pool of PDF renderers"""
+
+    def __init__(self, workers: int = RENDER_WORKERS):
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._wake = threading.Event()
+        # spawn: forking a threaded Streamlit server is unsafe
+        self._pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        self._threads = [threading.Thread(target=self._loop, daemon=True, name=f"render-{i}")
+                         for i in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def wake(self):
+        """Call after committing an enqueue so an idle worker picks the job up now"""
+        self._wake.set()
+
+    def _loop(self):
+        while True:
+            try:
+                job = claim(self.owner)
+            except Exception:
+                job = None   # database unavailable; try again after the poll interval
+            if job is None:
+                self._wake.wait(POLL_SECONDS)
+                self._wake.clear()
+                continue
+            self.run(job)
+
+    def run(self, job):
+        from db import fetch_document, load_items, document_values
+        from pdf_gen import generate_professional_pdf, TEMPLATE_VERSION
+        table, number = job["doc_type"], job["doc_number"]
+        doc_type = "INVOICE" if table == "invoices" else "QUOTATION"
+        try:
+            row = fetch_document(table, number)
+            if row is None:
+                _finish(job["id"], status="failed", last_error="Document no longer exists")
+                return
+            if table in pdf_store.FINALIZED_TABLES:
+                # rendered exactly once; afterwards served from the blob store
+                if not row.get("pdf_sha256"):
+                    values, items = document_values(table, row), load_items(table, row["id"])
+                    with tracing.span("render_queue.render"):
+                        data = self._pool.submit(generate_professional_pdf, values, items, doc_type).result()
+                    pdf_store.finalize(table, number, data)
+                _finish(job["id"], status="done", cache_key=None, last_error=None)
+                return
+            values, items = document_values(table, row), load_items(table, row["id"])
+            key = cache_key(values, items, TEMPLATE_VERSION)
+            if pdf_cache.get(key) is None:
+                with tracing.span("render_queue.render"):
+                    data = self._pool.submit(generate_professional_pdf, values, items, doc_type).result()
+                pdf_cache.put(key, (table, str(number)), data)
+            _finish(job["id"], status="done", cache_key=key, last_error=None)
+        except Exception:
+            error = traceback.format_exc(limit=3)
+            if job["attempts"] >= MAX_ATTEMPTS:
+                _finish(job["id"], status="failed", last_error=error)
+            else:
+                delay = RETRY_SECONDS * 2 ** (job["attempts"] - 1)
+                _finish(job["id"], status="pending", last_error=error,
+                        next_attempt_at=_now() + datetime.timedelta(seconds=delay))
+
+# -----------------------
+# CLI
+# -----------------------
+def backfill(batch: int = 1000) -> int:
+    """Queue a finalizing render for every invoice without a stored PDF; returns jobs queued"""
+    from db import engine
+    queued, after = 0, 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(text("""
+                SELECT id, invoice_number FROM invoices
+                WHERE pdf_sha256 IS NULL AND id > :after ORDER BY id LIMIT :limit
+            """), {"after": after, "limit": batch}).all()
+            if not rows:
+                return queued
+            for _, number in rows:
+                enqueue(conn, "invoices", number)
+        after = rows[-1][0]
+        queued += len(rows)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="PDF render queue")
+    parser.add_argument("command", choices=["worker", "backfill"],
+                        help="worker: drain the queue until interrupted; "
+                             "backfill: queue every invoice that has no stored PDF yet")
+    parser.add_argument("--workers", type=int, default=RENDER_WORKERS)
+    args = parser.parse_args(argv)
+    from db import init_db
+    init_db()
+    if args.command == "backfill":
+        sys.stderr.write(f"Queued {backfill()} invoices\n")
+        return
+    RenderQueue(args.workers).wake()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
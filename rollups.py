@@ -0,0 +1,148 @@
+import sys
+import argparse
+import datetime
+from sqlalchemy import text
+
+from totals import money, gst_amount
+
+# -----------------------
+# Revenue rollups (daily / monthly, per document type and customer)
+# -----------------------
+# Maintained in the same transaction as every insert (db.insert_document) and
+# delete (db.delete_row), so the dashboard never has to scan the document tables.
+ROLLUP_TABLES = {"revenue_daily": ("day", "DATE"), "revenue_monthly": ("month", "CHAR(7)")}
+MEASURES = ["doc_count", "subtotal", "cgst", "sgst", "discount", "total"]
+
+def create_tables(conn):
+    for table, (period, period_type) in ROLLUP_TABLES.items():
+        conn.execute(text(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                {period} {period_type} NOT NULL,
+                doc_type VARCHAR(16) NOT NULL,
+                customer_name VARCHAR(255) NOT NULL DEFAULT '',
+                doc_count INT NOT NULL DEFAULT 0,
+                subtotal DECIMAL(14,2) NOT NULL DEFAULT 0,
+                cgst DECIMAL(14,2) NOT NULL DEFAULT 0,
+                sgst DECIMAL(14,2) NOT NULL DEFAULT 0,
+                discount DECIMAL(14,2) NOT NULL DEFAULT 0,
+                total DECIMAL(14,2) NOT NULL DEFAULT 0,
+                PRIMARY KEY ({period}, doc_type, customer_name)
+            )
+        """))
+
+def _day(value):
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    return datetime.date.fromisoformat(str(value)[:10])
+
+def _upsert(conn, table: str, period: str, rows: list):
+    if conn.dialect.name == "sqlite":
+        on_conflict = (f"ON CONFLICT ({period}, doc_type, customer_name) DO UPDATE SET "
+                       + ", ".join(f"{m} = {m} + excluded.{m}" for m in MEASURES))
+    else:
+        on_conflict = "ON DUPLICATE KEY UPDATE " + ", ".join(f"{m} = {m} + VALUES({m})" for m in MEASURES)
+    conn.execute(text(f"""
+        INSERT INTO {table} ({period}, doc_type, customer_name, {', '.join(MEASURES)})
+        VALUES (:period, :doc_type, :customer, :doc_count, :subtotal, :cgst, :sgst, :discount, :total)
+        {on_conflict}
+    """), rows)
+
+def apply_documents(conn, table: str, doc_ids, sign: int = 1):
+    """Add (sign=1) or remove (sign=-1) documents' amounts from the rollups"""
+    if not doc_ids:
+        return
+    rows = conn.execute(text(f"""
+        SELECT created_at, customer_name, subtotal, cgst_rate, sgst_rate, discount, total
+        FROM {table} WHERE id IN ({', '.join(str(int(i)) for i in doc_ids)})
+    """)).all()
+    deltas = []
+    for created_at, customer, subtotal, cgst_rate, sgst_rate, discount, total in rows:
+        subtotal = money(subtotal)
+        day = _day(created_at or datetime.datetime.now())
+        deltas.append({
+            "day": day, "doc_type": table, "customer": customer or "", "doc_count": sign,
+            "subtotal": sign * subtotal,
+            "cgst": sign * gst_amount(subtotal, cgst_rate or 0),
+            "sgst": sign * gst_amount(subtotal, sgst_rate or 0),
+            "discount": sign * money(discount), "total": sign * money(total),
+        })
+    for table_name, (period, _) in ROLLUP_TABLES.items():
+        rows = [dict(d, period=d["day"] if period == "day" else d["day"].strftime("%Y-%m")) for d in deltas]
+        _upsert(conn, table_name, period, rows)
+        if sign < 0 and rows:
+            # only the keys this batch touched: a primary-key seek each, not a table scan
+            keys = {(r["period"], r["doc_type"], r["customer"]) for r in rows}
+            conn.execute(text(f"""
+                DELETE FROM {table_name}
+                WHERE {period} = :period AND doc_type = :doc_type AND customer_name = :customer AND doc_count <= 0
+            """), [{"period": p, "doc_type": t, "customer": c} for p, t, c in keys])
+
+def rebuild(conn, tables):
+    """Recompute both rollup tables from scratch (repair), in the caller's transaction.
+
+    Covers every document, so a pending rollups backfill is marked done first;
+    left pending it would add the older documents a second time."""
+    import migrations
+    migrations.finish_backfill(conn, "rollups")
+    conn.execute(text("DELETE FROM revenue_daily"))
+    conn.execute(text("DELETE FROM revenue_monthly"))
+    for table in tables:
+        conn.execute(text(f"""
+            INSERT INTO revenue_daily (day, doc_type, customer_name, {', '.join(MEASURES)})
+            SELECT DATE(created_at), :doc_type, COALESCE(customer_name, ''), COUNT(*),
+                   COALESCE(SUM(subtotal), 0),
+                   COALESCE(SUM(ROUND(subtotal * cgst_rate / 100.0, 2)), 0),
+                   COALESCE(SUM(ROUND(subtotal * sgst_rate / 100.0, 2)), 0),
+                   COALESCE(SUM(discount), 0), COALESCE(SUM(total), 0)
+            FROM {table}
+            GROUP BY DATE(created_at), COALESCE(customer_name, '')
+        """), {"doc_type": table})
+    conn.execute(text(f"""
+        INSERT INTO revenue_monthly (month, doc_type, customer_name, {', '.join(MEASURES)})
+        SELECT SUBSTR(day, 1, 7), doc_type, customer_name, {', '.join(f'SUM({m})' for m in MEASURES)}
+        FROM revenue_daily
+        GROUP BY SUBSTR(day, 1, 7), doc_type, customer_name
+    """))
+
+# -----------------------
+# Dashboard queries
+# -----------------------
+def monthly_totals(conn, months: int = 24):
+    return conn.execute(text("""
+        SELECT month, doc_type, SUM(doc_count) AS doc_count, SUM(subtotal) AS subtotal,
+               SUM(cgst) AS cgst, SUM(sgst) AS sgst, SUM(discount) AS discount, SUM(total) AS total
+        FROM revenue_monthly WHERE month >= :since
+        GROUP BY month, doc_type ORDER BY month
+    """), {"since": (datetime.date.today() - datetime.timedelta(days=31 * months)).strftime("%Y-%m")}).mappings().all()
+
+def daily_totals(conn, days: int = 90):
+    return conn.execute(text("""
+        SELECT day, doc_type, SUM(doc_count) AS doc_count, SUM(total) AS total
+        FROM revenue_daily WHERE day >= :since
+        GROUP BY day, doc_type ORDER BY day
+    """), {"since": datetime.date.today() - datetime.timedelta(days=days)}).mappings().all()
+
+def top_customers(conn, since_month: str, limit: int = 10):
+    return conn.execute(text("""
+        SELECT customer_name, SUM(doc_count) AS doc_count, SUM(total) AS total
+        FROM revenue_monthly WHERE doc_type = 'invoices' AND month >= :since
+        GROUP BY customer_name ORDER BY SUM(total) DESC LIMIT :limit
+    """), {"since": since_month, "limit": limit}).mappings().all()
+
+# -----------------------
+# CLI
+# -----------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain the revenue rollup tables")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.parse_args(argv)
+    from db import engine, init_db, DOCUMENT_TABLES
+    init_db()
+    with engine.begin() as conn:
+        rebuild(conn, DOCUMENT_TABLES)
+    sys.stderr.write("Rollups rebuilt\n")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+import re
+from sqlalchemy import text
+from tracing import traced
+
+# -----------------------
+# Full-text document search + customer autocomplete
+# -----------------------
+# search_documents holds one entry per invoice/quotation: number, customer
+# name and address, and the line-item descriptions. On SQLite it is an FTS5
+# table keyed by rowid, on MySQL an InnoDB table with a FULLTEXT index. Either
+# way the key is doc_id * KEY_SPACE + the type code, and results are paged
+# newest first by key (keyset paging). FTS5 walks its matches in rowid order,
+# so a SQLite page stops after `limit` rows. InnoDB's FULLTEXT index returns
+# its matches unordered: MySQL collects and sorts the whole match set before
+# the LIMIT, so a broad query costs in proportion to its matches, not the page.
+# InnoDB also leaves words shorter than innodb_ft_min_token_size (3 by
+# default) out of the index; such query words are matched with LIKE on the
+# number and customer name instead, and a query made only of them scans the
+# key backwards until a page is filled.
+# Like the rollups it is kept up to date in the writer's transaction
+# (db.insert_document, db.delete_row, importer).
+DOC_TYPES = {"invoices": 1, "quotations": 2}
+KEY_SPACE = 4
+SEARCH_COLUMNS = ["doc_number", "customer_name", "customer_address", "descriptions"]
+SUGGESTION_LIMIT = 8
+MYSQL_MIN_TOKEN = 3     # innodb_ft_min_token_size
+SHORT_WORD_COLUMNS = ["doc_number", "customer_name"]
+
+def doc_key(table: str, doc_id) -> int:
+    return int(doc_id) * KEY_SPACE + DOC_TYPES[table]
+
+def _key_column(conn):
+    return "rowid" if conn.dialect.name == "sqlite" else "doc_key"
+
+def create_tables(conn) -> bool:
+    """Create the search and customer tables; True when the search table is new (needs the search backfill)"""
+    from sqlalchemy import inspect
+    created = not inspect(conn).has_table("search_documents")
+    if conn.dialect.name == "sqlite":
+        # prefix indexes keep 'abc*' queries from walking the whole term list
+        conn.execute(text(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS search_documents USING fts5(
+                {', '.join(SEARCH_COLUMNS)}, tokenize = 'unicode61 remove_diacritics 2', prefix = '1 2 3 4'
+            )
+        """))
+    else:
+        conn.execute(text(f"""
+            CREATE TABLE IF NOT EXISTS search_documents (
+                doc_key BIGINT PRIMARY KEY,
+                doc_number VARCHAR(64),
+                customer_name VARCHAR(255),
+                customer_address TEXT,
+                descriptions MEDIUMTEXT,
+                FULLTEXT KEY ft_search_documents ({', '.join(SEARCH_COLUMNS)})
+            ) ENGINE=InnoDB
+        """))
+    # Distinct customer names (lower-cased key) with the address last used for them
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS customers (
+            name_key VARCHAR(255) PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            address TEXT
+        )
+    """))
+    return created
+
+# -----------------------
+# Index maintenance
+# -----------------------
+def remove_documents(conn, table: str, doc_ids):
+    if not doc_ids:
+        return
+    keys = ", ".join(str(doc_key(table, i)) for i in doc_ids)
+    conn.execute(text(f"DELETE FROM search_documents WHERE {_key_column(conn)} IN ({keys})"))
+
+def _upsert_customers(conn, rows: list):
+    if conn.dialect.name == "sqlite":
+        on_conflict = "ON CONFLICT (name_key) DO UPDATE SET name = excluded.name, address = excluded.address"
+    else:
+        on_conflict = "ON DUPLICATE KEY UPDATE name = VALUES(name), address = VALUES(address)"
+    conn.execute(text(f"INSERT INTO customers (name_key, name, address) VALUES (:key, :name, :address) {on_conflict}"),
+                 rows)
+
+def index_documents(conn, table: str, doc_ids):
+    """(Re)index documents from their header rows and line items"""
+    from db import DOCUMENT_TABLES, ITEM_TABLES
+    if not doc_ids:
+        return
+    ids = ", ".join(str(int(i)) for i in doc_ids)
+    items_table, fk = ITEM_TABLES[table]
+    descriptions = {}
+    for doc_id, desc in conn.execute(text(
+            f"SELECT {fk}, description FROM {items_table} WHERE {fk} IN ({ids}) ORDER BY {fk}, line_no")):
+        descriptions.setdefault(doc_id, []).append(desc or "")
+    rows = conn.execute(text(
+        f"SELECT id, {DOCUMENT_TABLES[table]}, customer_name, customer_address FROM {table} WHERE id IN ({ids}) ORDER BY id"
+    )).all()
+    remove_documents(conn, table, doc_ids)
+    if not rows:
+        return
+    conn.execute(text(f"""
+        INSERT INTO search_documents ({_key_column(conn)}, {', '.join(SEARCH_COLUMNS)})
+        VALUES (:key, :number, :customer, :address, :descriptions)
+    """), [{"key": doc_key(table, doc_id), "number": number, "customer": customer or "", "address": address or "",
+            "descriptions": "\n".join(descriptions.get(doc_id, []))}
+           for doc_id, number, customer, address in rows])
+    latest = {}
+    for _, _, customer, address in rows:
+        if customer and customer.strip():
+            latest[customer.strip().lower()[:255]] = {"key": customer.strip().lower()[:255],
+                                                      "name": customer.strip()[:255], "address": address or ""}
+    if latest:
+        _upsert_customers(conn, list(latest.values()))
+
+# -----------------------
+# Queries
+# -----------------------
+def _words(query: str) -> list:
+    return re.findall(r"\w+", query or "")
+
+def match_expression(query: str, dialect: str):
+    """Every word of the query must match, each as a prefix; None when there are no words.
+    On MySQL words shorter than MYSQL_MIN_TOKEN are left out (see search_sql)."""
+    words = _words(query)
+    if dialect == "sqlite":
+        return " ".join(f'"{w}"*' for w in words) or None
+    return " ".join(f"+{w}*" for w in words if len(w) >= MYSQL_MIN_TOKEN) or None
+
+def search_sql(query: str, dialect: str, table: str = None, before: int = None, limit: int = 50):
+    """(sql, params) selecting one page of matching keys, newest first; None when the query has no words"""
+    words = _words(query)
+    if not words:
+        return None
+    key = "rowid" if dialect == "sqlite" else "doc_key"
+    match = match_expression(query, dialect)
+    where, params = [], {"limit": limit}
+    if dialect == "sqlite":
+        where.append("search_documents MATCH :q")
+    elif match:
+        where.append(f"MATCH ({', '.join(SEARCH_COLUMNS)}) AGAINST (:q IN BOOLEAN MODE)")
+    if match:
+        params["q"] = match
+    if dialect != "sqlite":
+        short = [w for w in words if len(w) < MYSQL_MIN_TOKEN]
+        for i, word in enumerate(short):
+            where.append("(" + " OR ".join(f"{c} LIKE :w{i} ESCAPE '!'" for c in SHORT_WORD_COLUMNS) + ")")
+            params[f"w{i}"] = "%" + re.sub(r"([!%_])", r"!\1", word) + "%"
+    if table:
+        where.append(f"{key} % {KEY_SPACE} = :type")
+        params["type"] = DOC_TYPES[table]
+    if before is not None:
+        where.append(f"{key} < :before")
+        params["before"] = before
+    sql = f"SELECT {key} FROM search_documents WHERE {' AND '.join(where)} ORDER BY {key} DESC LIMIT :limit"
+    return sql, params
+
+@traced("db.search_documents")
+def search_documents(query: str, table: str = None, before: int = None, limit: int = None, conn=None):
+    """One page of matching documents, newest first.
+
+    `table` limits results to invoices or quotations; `before` is the `key` of
+    the last row on the previous page. Returns (rows, has_more); rows carry the
+    history-grid columns plus doc_type and key."""
+    from db import connect, DOCUMENT_TABLES, HISTORY_PAGE_SIZE
+    limit = limit or HISTORY_PAGE_SIZE
+    with connect(conn) as conn:
+        page = search_sql(query, conn.dialect.name, table, before, limit + 1)
+        if page is None:
+            return [], False
+        sql, params = page
+        keys = [r[0] for r in conn.execute(text(sql), params)]
+        has_more = len(keys) > limit
+        keys = keys[:limit]
+        found = {}
+        for doc_type, code in DOC_TYPES.items():
+            ids = [k // KEY_SPACE for k in keys if k % KEY_SPACE == code]
+            if not ids:
+                continue
+            number_field = DOCUMENT_TABLES[doc_type]
+            for row in conn.execute(text(
+                    f"SELECT id, {number_field}, customer_name, created_at, total FROM {doc_type} "
+                    f"WHERE id IN ({', '.join(str(i) for i in ids)})")).mappings():
+                found[doc_key(doc_type, row["id"])] = dict(row, doc_type=doc_type, key=doc_key(doc_type, row["id"]))
+    # an index entry whose document has gone is skipped rather than shown
+    return [found[k] for k in keys if k in found], has_more
+
+@traced("db.customer_suggestions")
+def customer_suggestions(prefix: str, limit: int = SUGGESTION_LIMIT):
+    """[(name, last address)] of customers whose name starts with `prefix` (case-insensitive)"""
+    from db import engine
+    prefix = (prefix or "").strip().lower()
+    if not prefix:
+        return []
+    # a key range rather than LIKE so both backends can seek the primary key
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    with engine.connect() as conn:
+        return [tuple(r) for r in conn.execute(text(
+            "SELECT name, address FROM customers WHERE name_key >= :lo AND name_key < :hi "
+            "ORDER BY name_key LIMIT :limit"), {"lo": prefix, "hi": upper, "limit": limit})]
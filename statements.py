@@ -0,0 +1,358 @@
+import os
+import re
+import sys
+import argparse
+import datetime
+import tempfile
+import zipfile
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, BrokenExecutor
+from sqlalchemy import text
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+from reportlab.platypus import Paragraph, Spacer, Table, TableStyle
+
+from db import engine, document_filters, load_items_for
+from bulk_export import ERRORS_NAME
+from pdf_gen import (
+    get_template, number_to_words, fonts, InvoiceColors, FRAME_WIDTH, FRAME_TOP, FRAME_BOTTOM,
+    ITEM_COL_WIDTHS, ITEM_HEADER, ITEM_TABLE_STYLE,
+    header_flowables, totals_flowables, description_cell, draw_flowables, flowables_height,
+)
+from totals import compute_totals, to_decimal, money
+from tracing import traced, span
+
+# -----------------------
+# Customer statements
+# -----------------------
+# One PDF per customer covering every invoice in a period: an account summary
+# with the amount due in words, the ledger (opening balance, each invoice and
+# the running balance) and then a section per invoice with its line items.
+# Nothing is collected up front: invoice rows are streamed off the customer
+# index (idx_invoices_customer) twice -- headers for the ledger, then headers
+# plus items a batch at a time for the sections -- and drawn a page at a time
+# with pdf_gen's styles and watermark, so memory is flat in the number of
+# invoices. There is no payments table, so the balance is what was invoiced.
+# ReportLab loads with this module: app.py imports it on first use only.
+#
+#   python statements.py statement.pdf --customer "Acme Traders" --from 2026-04-01
+#   python statements.py statements.zip --from 2026-04-01 --to 2027-03-31    (every customer)
+FETCH_BATCH = 200
+LEDGER_COL_WIDTHS = [80, 190, 90, 90]
+LEDGER_HEADER = ["Date", "Invoice #", "Amount", "Balance"]
+LEDGER_TABLE_STYLE = [
+    ('BACKGROUND',(0,0),(-1,0),InvoiceColors.PRIMARY),
+    ('TEXTCOLOR',(0,0),(-1,0),InvoiceColors.WHITE),
+    ('ALIGN',(0,0),(1,-1),'LEFT'),
+    ('ALIGN',(2,0),(3,-1),'RIGHT'),
+    ('VALIGN',(0,0),(-1,-1),'MIDDLE'),
+    ('BOX',(0,0),(-1,-1),1,InvoiceColors.BORDER),
+    ('INNERGRID',(0,0),(-1,-1),0.5,InvoiceColors.BORDER),
+]
+TASKS_PER_WORKER = 50               # batch workers are replaced after this many statements
+
+def _customer_filter(start=None, end=None):
+    """WHERE clause + params for one customer's invoices in the period (:customer still to bind)"""
+    where, params = document_filters(start, end)
+    return f"{where} AND customer_name = :customer" if where else " WHERE customer_name = :customer", params
+
+def _date(value) -> str:
+    if isinstance(value, str):
+        value = datetime.datetime.fromisoformat(value)
+    return value.strftime("%d/%m/%Y") if value else ""
+
+@traced("statements.summary")
+def statement_summary(conn, customer: str, start=None, end=None) -> dict:
+    """Opening balance, invoice count/amount and last invoice id of the period, plus the latest address"""
+    where, params = _customer_filter(start, end)
+    params["customer"] = customer
+    count, invoiced, last_id = conn.execute(text(
+        f"SELECT COUNT(*), COALESCE(SUM(total), 0), MAX(id) FROM invoices{where}"), params).one()
+    address = conn.execute(text(
+        f"SELECT customer_address FROM invoices{where} ORDER BY created_at DESC, id DESC LIMIT 1"), params).scalar()
+    opening = 0
+    if start:
+        opening = conn.execute(text(
+            "SELECT COALESCE(SUM(total), 0) FROM invoices WHERE customer_name = :customer AND created_at < :start"),
+            {"customer": customer, "start": params["start"]}).scalar()
+    opening, invoiced = money(to_decimal(opening)), money(to_decimal(invoiced))
+    return {"customer": customer, "address": address or "", "count": count, "last_id": last_id or 0,
+            "opening": opening, "invoiced": invoiced, "closing": opening + invoiced}
+
+def _stream(conn, columns: str, customer: str, start, end, last_id: int):
+    """Invoice rows of the period up to last_id (rows added meanwhile are left out), oldest first"""
+    where, params = _customer_filter(start, end)
+    params.update(customer=customer, last_id=last_id)
+    result = conn.execution_options(stream_results=True, yield_per=FETCH_BATCH).execute(
+        text(f"SELECT {columns} FROM invoices{where} AND id <= :last_id ORDER BY created_at, id"), params)
+    return result.mappings().partitions(FETCH_BATCH)
+
+
+class _PageWriter:
+    """Flowables and tables drawn top-down onto a canvas, a page at a time"""
+
+    def __init__(self, out, template, continued):
+        self.canvas = canvas.Canvas(out, pagesize=A4, pageCompression=1)
+        self.template = template
+        self.continued = continued
+        self.y = None
+
+    def new_page(self):
+        first = self.y is None
+        if not first:
+            self.canvas.showPage()
+        self.template.draw_watermark(self.canvas)
+        self.y = FRAME_TOP
+        if not first:
+            self.y = draw_flowables(self.canvas, self.continued(), self.y)
+
+    def room(self) -> float:
+        return self.y - FRAME_BOTTOM
+
+    def add(self, flowables, keep_with: float = 0):
+        """Draw flowables that belong together, on a fresh page unless they (plus keep_with points) fit"""
+        if flowables_height(flowables) + keep_with > self.room():
+            self.new_page()
+        self.y = draw_flowables(self.canvas, flowables, self.y)
+
+    def rows(self, header, col_widths, style, rows):
+        """Table from an iterable of (cells, height, bold), split into one Table per page, header repeated"""
+        header_height = self.plain_height(header, col_widths)
+
+        def draw(page_rows, bold_rows):
+            bold = [('FONTNAME',(0,r),(-1,r),fonts()['bold']) for r in bold_rows]
+            table = Table([header] + page_rows, colWidths=col_widths)
+            table.setStyle(TableStyle(style + bold))
+            self.y = draw_flowables(self.canvas, [table], self.y)
+
+        page_rows, bold_rows = [], []
+        if self.room() < 2 * header_height:
+            self.new_page()
+        room = self.room() - header_height
+        for cells, height, bold in rows:
+            if height > room and page_rows:
+                draw(page_rows, bold_rows)
+                self.new_page()
+                page_rows, bold_rows = [], []
+                room = self.room() - header_height
+            page_rows.append(cells)
+            if bold:
+                bold_rows.append(len(page_rows))
+            room -= height
+        if page_rows:
+            draw(page_rows, bold_rows)
+        self.y = draw_flowables(self.canvas, [Spacer(1, 15)], self.y)
+
+    @staticmethod
+    def plain_height(header, col_widths) -> float:
+        return Table([header], colWidths=col_widths).wrap(FRAME_WIDTH, A4[1])[1]
+
+    def save(self):
+        self.canvas.showPage()
+        with span("statements.save"):
+            self.canvas.save()
+
+
+@traced("statements.render")
+def render_statement(customer: str, out, start=None, end=None) -> int:
+    """Write one customer's statement for the period to `out` (a path or binary file).
+
+    Returns the number of invoices it covers."""
+    template = get_template()
+    styles = template.styles
+    today = datetime.date.today()
+    period = (f"<b>From:</b> {start.strftime('%d/%m/%Y') if start else 'Beginning'}<br/>"
+              f"<b>To:</b> {(end or today).strftime('%d/%m/%Y')}")
+
+    with engine.connect() as conn, engine.connect() as items_conn:
+        s = statement_summary(conn, customer, start, end)
+        page = _PageWriter(out, template, lambda: [
+            Paragraph(f"<b>Statement:</b> {customer} (continued)", styles['doc_info']), Spacer(1, 10)])
+        page.new_page()
+
+        # Header and account summary
+        values = {"customer_name": customer, "customer_address": s["address"]}
+        info = f"{period}<br/><b>Date:</b> {today.strftime('%d/%m/%Y')}"
+        summary = Table([["Opening Balance", f"{s['opening']:,.2f}"],
+                         [f"Invoiced in Period ({s['count']})", f"{s['invoiced']:,.2f}"],
+                         ["AMOUNT DUE", f"{s['closing']:,.2f}"]], colWidths=[160, 90], hAlign='RIGHT')
+        summary.setStyle(TableStyle([
+            ('ALIGN',(1,0),(1,-1),'RIGHT'),
+            ('FONTNAME',(0,-1),(-1,-1),fonts()['bold']),
+            ('BOX',(0,0),(-1,-1),1,InvoiceColors.BORDER),
+            ('INNERGRID',(0,0),(-1,-1),0.5,InvoiceColors.BORDER),
+        ]))
+        page.add(header_flowables(values, template, title="STATEMENT OF ACCOUNT", info=info))
+        page.add([summary, Spacer(1, 10),
+                  Paragraph(f"<b>Amount Due in Words:</b> {number_to_words(s['closing'])}", styles['bold']),
+                  Spacer(1, 15)])
+
+        # Ledger: one row per invoice with the running balance
+        plain_height = page.plain_height(LEDGER_HEADER, LEDGER_COL_WIDTHS)
+
+        def ledger_rows():
+            balance = s["opening"]
+            yield ["", "Opening Balance", "", f"{balance:,.2f}"], plain_height, True
+            for batch in _stream(conn, "id, invoice_number, created_at, total", customer, start, end, s["last_id"]):
+                for row in batch:
+                    amount = money(to_decimal(row["total"]))
+                    balance += amount
+                    yield ([_date(row["created_at"]), str(row["invoice_number"]), f"{amount:,.2f}", f"{balance:,.2f}"],
+                           plain_height, False)
+            yield ["", "Closing Balance", "", f"{balance:,.2f}"], plain_height, True
+
+        with span("statements.ledger"):
+            page.rows(LEDGER_HEADER, LEDGER_COL_WIDTHS, LEDGER_TABLE_STYLE, ledger_rows())
+
+        # One section per invoice
+        item_height = page.plain_height(ITEM_HEADER, ITEM_COL_WIDTHS)
+
+        def item_rows(items, lines):
+            for i, ((desc, qty, rate), total) in enumerate(zip(items, lines), start=1):
+                cell, height = description_cell(desc, styles['normal'], item_height)
+                yield [str(i), cell, f"{qty:g}", f"{rate:,.2f}", f"{total:,.2f}"], height, False
+
+        with span("statements.sections"):
+            for batch in _stream(conn, "id, invoice_number, created_at, cgst_rate, sgst_rate, discount",
+                                 customer, start, end, s["last_id"]):
+                items = load_items_for(items_conn, "invoices", [row["id"] for row in batch])
+                for row in batch:
+                    values = {"cgst_rate": float(row["cgst_rate"] or 0), "sgst_rate": float(row["sgst_rate"] or 0)}
+                    amounts = compute_totals(items[row["id"]], values["cgst_rate"], values["sgst_rate"],
+                                             float(row["discount"] or 0))
+                    page.add([Paragraph(f"<b>Invoice #:</b> {row['invoice_number']} &nbsp; "
+                                        f"<b>Date:</b> {_date(row['created_at'])}", styles['normal']),
+                              Spacer(1, 6)], keep_with=3 * item_height)
+                    page.rows(ITEM_HEADER, ITEM_COL_WIDTHS, ITEM_TABLE_STYLE,
+                              item_rows(items[row["id"]], amounts["lines"]))
+                    page.add([totals_flowables(values, amounts, styles)[0], Spacer(1, 20)])
+        page.save()
+    return s["count"]
+
+def write_statement(out, customer: str, start=None, end=None, progress=None) -> int:
+    """render_statement in the (out, progress=...) shape BackgroundFileJob calls"""
+    count = render_statement(customer, out, start, end)
+    if progress:
+        progress(1, 1)
+    return count
+
+# -----------------------
+# Batch: every customer
+# -----------------------
+def iter_customers(start=None, end=None):
+    """Distinct customer names with invoices in the period, read off the customer index"""
+    where, params = document_filters(start, end)
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=FETCH_BATCH).execute(
+            text(f"SELECT DISTINCT customer_name FROM invoices{where} ORDER BY customer_name"), params)
+        for (name,) in result:
+            if name:
+                yield name
+
+def count_customers(start=None, end=None) -> int:
+    where, params = document_filters(start, end)
+    with engine.connect() as conn:
+        return conn.execute(text(f"SELECT COUNT(DISTINCT customer_name) FROM invoices{where}"), params).scalar() or 0
+
+def statement_filename(customer: str) -> str:
+    return f"Statement_{re.sub(r'[^A-Za-z0-9._-]+', '_', customer).strip('_') or 'customer'}.pdf"
+
+def _render_to_file(args):
+    # runs in a pool worker: the PDF goes to disk there, only its path comes back
+    customer, start, end, directory = args
+    fd, path = tempfile.mkstemp(prefix="statement_", suffix=".pdf", dir=directory)
+    with os.fdopen(fd, "wb") as fh:
+        render_statement(customer, fh, start, end)
+    return path
+
+def export_statements(out, start=None, end=None, workers: int = None, progress=None, skipped: list = None) -> int:
+    """Render every customer's statement on a process pool into a ZIP.
+
+    `out` is a path or writable binary file. Each worker streams its customer
+    from the database and writes the PDF to a temporary file, which is copied
+    into the ZIP and deleted; about two statements per worker are in flight.
+    A statement that fails to render is left out and listed, with its error, in
+    ERRORS.txt inside the ZIP; the customer is also appended to `skipped` if given.
+    `progress(done, total)` is called after each customer.
+    Returns the number of statements written."""
+    workers = workers or os.cpu_count() or 1
+    total = count_customers(start, end)
+    done = 0
+    failed = []
+    window = deque()
+    names = set()
+
+    def drain_one(zf):
+        nonlocal done
+        customer, name, pending = window.popleft()
+        try:
+            path = pending.result()
+        except BrokenExecutor:
+            raise
+        except Exception as e:
+            failed.append(f"{customer}: {type(e).__name__}: {e}")
+            if skipped is not None:
+                skipped.append(customer)
+        else:
+            try:
+                zf.write(path, name)
+            finally:
+                os.unlink(path)
+            done += 1
+        if progress:
+            progress(done + len(failed), total)
+
+    # spawn: forking a threaded Streamlit server is unsafe
+    ctx = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory(prefix="statements_") as tmp, \
+            ProcessPoolExecutor(max_workers=workers, mp_context=ctx, max_tasks_per_child=TASKS_PER_WORKER) as pool, \
+            zipfile.ZipFile(out, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for customer in iter_customers(start, end):
+            name = statement_filename(customer)
+            stem, n = name[:-4], 1
+            while name in names:            # names that only differ in punctuation
+                n += 1
+                name = f"{stem}_{n}.pdf"
+            names.add(name)
+            window.append((customer, name, pool.submit(_render_to_file, (customer, start, end, tmp))))
+            if len(window) >= workers * 2:
+                drain_one(zf)
+        while window:
+            drain_one(zf)
+        if failed:
+            zf.writestr(ERRORS_NAME, "Not exported, failed to render:\n" + "\n".join(failed) + "\n")
+    return done
+
+# -----------------------
+# CLI
+# -----------------------
+def _day(value):
+    return datetime.datetime.strptime(value, "%Y-%m-%d").date()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Customer statements of account")
+    parser.add_argument("out", help="PDF to write (with --customer) or ZIP of every customer's statement")
+    parser.add_argument("--customer", help="exact customer name; omit for every customer")
+    parser.add_argument("--from", dest="start", type=_day, help="first day (YYYY-MM-DD); earlier invoices form the opening balance")
+    parser.add_argument("--to", dest="end", type=_day, help="last day, inclusive (YYYY-MM-DD)")
+    parser.add_argument("--workers", type=int, default=None, help="render processes for the batch (default: CPU count)")
+    args = parser.parse_args(argv)
+    if args.customer:
+        count = render_statement(args.customer, args.out, args.start, args.end)
+        sys.stderr.write(f"Wrote the statement for {args.customer} ({count} invoices) to {args.out}\n")
+        return
+
+    def report(done, total):
+        sys.stderr.write(f"\r{done}/{total} statements")
+        sys.stderr.flush()
+
+    skipped = []
+    written = export_statements(args.out, args.start, args.end, args.workers, report, skipped)
+    sys.stderr.write(f"\nWrote {written} statements to {args.out}\n")
+    if skipped:
+        sys.stderr.write(f"Skipped {len(skipped)} that failed to render (see {ERRORS_NAME} in the ZIP): "
+                         f"{', '.join(skipped[:20])}{' ...' if len(skipped) > 20 else ''}\n")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,4 @@
+import os
+
+# db.py builds its engine at import: keep the suite on a private in-memory SQLite database
+os.environ["DB_URL"] = "sqlite://"
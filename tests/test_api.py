@@ -0,0 +1,41 @@
+import pytest
+from starlette.testclient import TestClient
+
+import api
+import db
+import migrations
+
+@pytest.fixture(scope="module")
+def client(tmp_path_factory):
+    # aiosqlite cannot share the suite's in-memory database: the API gets a file of its own
+    url = f"sqlite:///{tmp_path_factory.mktemp('api') / 'billing.db'}"
+    migrations.migrate(db.create_db_engine(url))
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(api, "init_db", lambda: None)
+        mp.setattr(api, "create_async_db_engine", lambda: db.create_async_db_engine(url))
+        with TestClient(api.app) as c:
+            yield c
+
+@pytest.mark.parametrize("item, error", [
+    ({"description": "Pen"}, "item 1 qty is required"),
+    ({"description": "Pen", "qty": 1}, "item 1 price is required"),
+    (["Pen", None, 10], "item 1 qty is required"),
+    (["Pen", 1.0005, 10], "item 1 qty has more than 3 decimal places"),
+    (["Pen", 1, 10.005], "item 1 price has more than 2 decimal places"),
+    (["Pen", "x", 10], "item 1 qty must be a non-negative number"),
+    (["Pen", 1, -1], "item 1 price must be a non-negative number"),
+])
+def test_bad_item_values_are_rejected(client, item, error):
+    r = client.post("/invoices", json={"customer_name": "Acme", "items": [item]})
+    assert r.status_code == 422
+    assert error in r.text
+
+def test_over_precise_rate_is_rejected(client):
+    r = client.post("/invoices", json={"customer_name": "Acme", "items": [["Pen", 1, 10]], "cgst_rate": 9.125})
+    assert r.status_code == 422 and "cgst_rate has more than 2 decimal places" in r.text
+
+def test_stored_values_are_echoed(client):
+    r = client.post("/invoices", json={"number": "T1", "customer_name": "Acme",
+                                       "items": [{"description": "Pen", "qty": "2.500", "price": 10.5}]})
+    assert r.status_code == 201
+    assert r.json()["items"] == [{"description": "Pen", "qty": "2.5", "price": "10.50", "line_total": "26.25"}]
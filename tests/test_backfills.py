@@ -0,0 +1,71 @@
+import pytest
+from sqlalchemy import text
+
+import db
+import migrations
+from db import engine, init_db
+
+LEGACY = [("L1", "Acme", "[('Pen', 2, 10.0)]", 20), ("L2", "Zenith", "[('Ink', 1, 5.5), ('Nib', 3, 1.0)]", 8.5)]
+
+def _seed_legacy(eng):
+    """Documents as stored before the item tables, with their backfills scheduled"""
+    with eng.begin() as conn:
+        for table in ["invoice_items", "invoices", "revenue_daily", "revenue_monthly", "schema_backfills"]:
+            conn.execute(text(f"DELETE FROM {table}"))
+        conn.execute(text("""
+            INSERT INTO invoices (invoice_number, customer_name, items, subtotal, cgst_rate, sgst_rate, discount, total,
+                                  created_at)
+            VALUES (:n, :c, :items, :total, 0, 0, 0, :total, '2026-04-01 10:00:00')
+        """), [{"n": n, "c": c, "items": items, "total": total} for n, c, items, total in LEGACY])
+        migrations.schedule_backfill(conn, "legacy_items")
+        migrations.schedule_backfill(conn, "rollups")
+
+def _rollup_counts(eng):
+    with eng.connect() as conn:
+        return dict(conn.execute(text("SELECT customer_name, doc_count FROM revenue_daily")).all())
+
+@pytest.fixture
+def legacy():
+    init_db()
+    _seed_legacy(engine)
+    yield
+    migrations.run_backfills(engine, pause=0)
+
+def test_readers_fall_back_to_legacy_items(legacy):
+    with engine.connect() as conn:
+        ids = dict(conn.execute(text("SELECT invoice_number, id FROM invoices")).all())
+        assert db.load_items_for(conn, "invoices", list(ids.values()))[ids["L2"]] == [("Ink", 1.0, 5.5), ("Nib", 3.0, 1.0)]
+    assert db.load_items("invoices", ids["L1"]) == [("Pen", 2.0, 10.0)]
+
+def test_delete_before_rollup_backfill_is_not_subtracted(legacy):
+    db.delete_row("invoices", "invoice_number", "L1")
+    assert _rollup_counts(engine) == {}
+    migrations.run_backfills(engine, pause=0)
+    assert _rollup_counts(engine) == {"Zenith": 1}
+    db.delete_row("invoices", "invoice_number", "L2")
+    assert _rollup_counts(engine) == {}
+
+def test_backfills_run_in_the_background(tmp_path):
+    eng = db.create_db_engine(f"sqlite:///{tmp_path / 'billing.db'}")
+    migrations.migrate(eng)
+    _seed_legacy(eng)
+    worker = migrations.start_backfills(eng)
+    assert worker is not None and worker.daemon
+    worker.join(60)
+    with eng.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM invoice_items")).scalar() == 3
+        assert not migrations.pending_backfills(conn)
+    assert _rollup_counts(eng) == {"Acme": 1, "Zenith": 1}
+    assert migrations.start_backfills(eng) is None
+
+def test_rebuild_finishes_the_rollup_backfill(legacy):
+    import rollups
+    with engine.begin() as conn:
+        rollups.rebuild(conn, db.DOCUMENT_TABLES)
+    assert _rollup_counts(engine) == {"Acme": 1, "Zenith": 1}
+    migrations.run_backfills(engine, pause=0)
+    assert _rollup_counts(engine) == {"Acme": 1, "Zenith": 1}
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT SUM(total) FROM revenue_monthly")).scalar() == 28.5
+    db.delete_row("invoices", "invoice_number", "L1")
+    assert _rollup_counts(engine) == {"Zenith": 1}
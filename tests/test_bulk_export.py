@@ -0,0 +1,38 @@
+import io
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from sqlalchemy import text
+
+import bulk_export
+import importer
+from db import engine, init_db
+
+@pytest.fixture(autouse=True)
+def invoices():
+    init_db()
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM invoice_items"))
+        conn.execute(text("DELETE FROM invoices"))
+    source = io.StringIO("invoice_number,customer_name,qty,price\nB1,X,1,10\nB2,Y,1,10\nB3,Z,1,10\n")
+    importer.import_file(source, {f: f for f in ["invoice_number", "customer_name", "qty", "price"]})
+
+def _render(args):
+    values, _, _ = args
+    if values["doc_number"] == "B2":
+        raise ValueError("bad logo")
+    return b"%PDF " + values["doc_number"].encode()
+
+def test_failed_render_is_skipped_and_listed(monkeypatch):
+    # threads instead of spawned processes, so the patched renderer is used
+    monkeypatch.setattr(bulk_export, "ProcessPoolExecutor",
+                        lambda max_workers, mp_context: ThreadPoolExecutor(max_workers))
+    monkeypatch.setattr(bulk_export, "_render", _render)
+    out, skipped, seen = io.BytesIO(), [], []
+    written = bulk_export.export_zip(out, workers=1, skipped=skipped, progress=lambda d, t: seen.append((d, t)))
+    assert written == 2 and skipped == ["B2"]
+    assert seen[-1] == (3, 3)
+    with zipfile.ZipFile(out) as zf:
+        assert sorted(zf.namelist()) == ["ERRORS.txt", "Invoice_B1.pdf", "Invoice_B3.pdf"]
+        assert "B2: ValueError: bad logo" in zf.read("ERRORS.txt").decode()
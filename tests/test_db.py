@@ -0,0 +1,23 @@
+import datetime
+import io
+
+from sqlalchemy import text
+
+import db
+import importer
+from db import engine, init_db
+
+def test_created_at_is_local_time():
+    init_db()
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM invoice_items"))
+        conn.execute(text("DELETE FROM invoices"))
+        db.insert_document(conn, "invoices", {"invoice_number": "D1", "customer_name": "Acme"}, [("Pen", 1, 10)])
+    importer.import_file(io.StringIO("invoice_number,customer_name,qty,price\nD2,Acme,1,10\n"),
+                         {f: f for f in ["invoice_number", "customer_name", "qty", "price"]})
+    today = datetime.date.today()
+    assert db.count_documents("invoices", start=today, end=today) == 2
+    with engine.connect() as conn:
+        for (created_at,) in conn.execute(text("SELECT created_at FROM invoices")):
+            stored = datetime.datetime.fromisoformat(str(created_at))
+            assert abs(stored - datetime.datetime.now()) < datetime.timedelta(minutes=1)
@@ -0,0 +1,39 @@
+import io
+
+import pytest
+from sqlalchemy import text
+
+import importer
+from db import engine, init_db
+
+HEADER = "invoice_number,customer_name,description,qty,price\n"
+
+@pytest.fixture(autouse=True)
+def empty_db():
+    init_db()
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM invoice_items"))
+        conn.execute(text("DELETE FROM invoices"))
+
+def _import(rows, chunk_rows):
+    source = io.StringIO(HEADER + "".join(f"{r}\n" for r in rows))
+    mapping = {f: f for f in ["invoice_number", "customer_name", "description", "qty", "price"]}
+    return importer.import_file(source, mapping, chunk_rows=chunk_rows)
+
+def _lines():
+    with engine.connect() as conn:
+        return dict(conn.execute(text(
+            "SELECT i.invoice_number, COUNT(*) FROM invoices i JOIN invoice_items l ON l.invoice_id = i.id "
+            "GROUP BY i.invoice_number")).all())
+
+@pytest.mark.parametrize("chunk_rows", [1, 2, 3, 100])
+def test_bad_line_rejects_invoice_across_chunks(chunk_rows):
+    summary = _import(["A1,X,a,1,10", "A2,Y,a,1,10", "A2,Y,b,x,10", "A3,Z,a,1,10"], chunk_rows)
+    assert _lines() == {"A1": 1, "A3": 1}
+    assert summary.error_count == 1 and summary.inserted == 2
+
+@pytest.mark.parametrize("chunk_rows", [1, 2, 3, 100])
+def test_non_consecutive_repeat_is_duplicate(chunk_rows):
+    summary = _import(["A4,X,a,1,10", "A5,Y,a,1,10", "A4,X,b,1,10", "A4,X,c,1,10", "A6,Z,a,1,10"], chunk_rows)
+    assert _lines() == {"A4": 1, "A5": 1, "A6": 1}
+    assert summary.duplicates == ["A4"] and summary.inserted == 3
@@ -0,0 +1,22 @@
+import io
+
+from sqlalchemy import text
+
+import db
+import importer
+from db import engine, init_db
+
+def test_delete_removes_only_its_emptied_keys():
+    init_db()
+    with engine.begin() as conn:
+        for table in ["invoice_items", "invoices", "revenue_daily", "revenue_monthly"]:
+            conn.execute(text(f"DELETE FROM {table}"))
+        # an emptied row some other batch left behind is not this delete's business
+        conn.execute(text("INSERT INTO revenue_monthly (month, doc_type, customer_name) VALUES ('2020-01', 'invoices', 'Old')"))
+    source = io.StringIO("invoice_number,customer_name,qty,price,created_at\nR1,Acme,1,10,01-05-2026\nR2,Acme,2,10,02-05-2026\n")
+    importer.import_file(source, {f: f for f in ["invoice_number", "customer_name", "qty", "price", "created_at"]})
+    db.delete_row("invoices", "invoice_number", "R1")
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT day, doc_count FROM revenue_daily")).all() == [("2026-05-02", 1)]
+        assert conn.execute(text("SELECT month, customer_name, doc_count, total FROM revenue_monthly ORDER BY month")).all() \
+            == [("2020-01", "Old", 0, 0), ("2026-05", "Acme", 1, 20)]
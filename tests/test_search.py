@@ -0,0 +1,54 @@
+import io
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.dialects import mysql
+
+import importer
+import search
+from db import engine, init_db
+
+def _mysql(query, **kwargs):
+    sql, params = search.search_sql(query, "mysql", **kwargs)
+    compiled = text(sql).compile(dialect=mysql.dialect())
+    return str(compiled), params
+
+def test_mysql_long_words_use_fulltext():
+    sql, params = _mysql("acme pune", table="invoices", before=41, limit=51)
+    assert sql == ("SELECT doc_key FROM search_documents WHERE "
+                   "MATCH (doc_number, customer_name, customer_address, descriptions) AGAINST (%s IN BOOLEAN MODE) "
+                   "AND doc_key %% 4 = %s AND doc_key < %s ORDER BY doc_key DESC LIMIT %s")
+    assert params == {"q": "+acme* +pune*", "type": 1, "before": 41, "limit": 51}
+
+def test_mysql_short_words_fall_back_to_like():
+    # below innodb_ft_min_token_size a word is not in the FULLTEXT index
+    sql, params = _mysql("A4 acme")
+    assert "AGAINST" in sql
+    assert "(doc_number LIKE %s ESCAPE '!' OR customer_name LIKE %s ESCAPE '!')" in sql
+    assert params["q"] == "+acme*" and params["w0"] == "%A4%"
+
+def test_mysql_only_short_words_skip_match():
+    sql, params = _mysql("x_")
+    assert "MATCH" not in sql and "q" not in params
+    assert params["w0"] == "%x!_%"
+
+def test_no_words():
+    assert search.search_sql(" -- ", "mysql") is None
+    assert search.search_sql("", "sqlite") is None
+
+@pytest.fixture
+def indexed():
+    init_db()
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM invoice_items"))
+        conn.execute(text("DELETE FROM invoices"))
+        conn.execute(text("DELETE FROM search_documents"))
+    source = io.StringIO("invoice_number,customer_name,description,qty,price\n"
+                         "A4,Acme Pune,Pen,1,10\nB7,Zenith,Ink,1,10\n")
+    importer.import_file(source, {f: f for f in ["invoice_number", "customer_name", "description", "qty", "price"]})
+
+def test_sqlite_prefix_search(indexed):
+    rows, more = search.search_documents("a4")
+    assert [r["invoice_number"] for r in rows] == ["A4"] and not more
+    rows, _ = search.search_documents("zen in", table="invoices")
+    assert [r["invoice_number"] for r in rows] == ["B7"]
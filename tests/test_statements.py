@@ -0,0 +1,38 @@
+import io
+import os
+import tempfile
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import text
+
+import importer
+import statements
+from db import engine, init_db
+
+def _render_to_file(args):
+    customer, _, _, directory = args
+    if customer == "Broken":
+        raise ValueError("bad address")
+    fd, path = tempfile.mkstemp(suffix=".pdf", dir=directory)
+    with os.fdopen(fd, "wb") as fh:
+        fh.write(b"%PDF " + customer.encode())
+    return path
+
+def test_failed_statement_is_skipped_and_listed(monkeypatch):
+    init_db()
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM invoice_items"))
+        conn.execute(text("DELETE FROM invoices"))
+    source = io.StringIO("invoice_number,customer_name,qty,price\nS1,Acme,1,10\nS2,Broken,1,10\nS3,Zenith,1,10\n")
+    importer.import_file(source, {f: f for f in ["invoice_number", "customer_name", "qty", "price"]})
+    # threads instead of spawned processes, so the patched renderer is used
+    monkeypatch.setattr(statements, "ProcessPoolExecutor",
+                        lambda max_workers, mp_context, max_tasks_per_child: ThreadPoolExecutor(max_workers))
+    monkeypatch.setattr(statements, "_render_to_file", _render_to_file)
+    out, skipped, seen = io.BytesIO(), [], []
+    written = statements.export_statements(out, workers=1, skipped=skipped, progress=lambda d, t: seen.append((d, t)))
+    assert written == 2 and skipped == ["Broken"] and seen[-1] == (3, 3)
+    with zipfile.ZipFile(out) as zf:
+        assert sorted(zf.namelist()) == ["ERRORS.txt", "Statement_Acme.pdf", "Statement_Zenith.pdf"]
+        assert "Broken: ValueError: bad address" in zf.read("ERRORS.txt").decode()
@@ -0,0 +1,34 @@
+from decimal import Decimal
+
+import pandas as pd
+import pytest
+
+from totals import compute_totals, line_total, batch_totals, from_paise
+
+# Inputs finer than the column scales: the Decimal path (save, PDF) and the
+# vectorized path (reconcile, importer) must round them the same way.
+HALF_PAISA_CASES = [
+    ([(2, 10.005)], 0, 0, 0),
+    ([(1.0005, 100)], 0, 0, 0),
+    ([(1, 100)], 9.125, 9.125, 0),
+    ([(3, 33.335), (0.0015, 999.995)], 2.5, 2.5, 0.005),
+    ([(1, "0.125"), (2.5, 1.015)], 0, 0, 0),
+]
+
+def _batch(items, cgst, sgst, discount):
+    lines = pd.DataFrame({"doc_id": [1] * len(items), "qty": [q for q, _ in items], "price": [p for _, p in items]})
+    headers = pd.DataFrame({"doc_id": [1], "cgst_rate": [cgst], "sgst_rate": [sgst], "discount": [discount]})
+    row = batch_totals(lines, headers).iloc[0]
+    return {k: from_paise([row[k]])[0] for k in ("subtotal", "cgst", "sgst", "discount", "total")}
+
+@pytest.mark.parametrize("items,cgst,sgst,discount", HALF_PAISA_CASES)
+def test_decimal_and_batch_paths_agree(items, cgst, sgst, discount):
+    exact = compute_totals([("x", q, p) for q, p in items], cgst, sgst, discount)
+    batch = _batch(items, cgst, sgst, discount)
+    for key in batch:
+        assert exact[key] == batch[key], key
+
+def test_inputs_quantized_half_up():
+    assert line_total(2, 10.005) == Decimal("20.02")
+    assert line_total(1.0005, 100) == Decimal("100.10")
+    assert compute_totals([("x", 1, 100)], 9.125)["cgst"] == Decimal("9.13")
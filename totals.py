@@ -0,0 +1,188 @@
+import sys
+import argparse
+from decimal import Decimal, ROUND_HALF_UP
+
+# -----------------------
+# Document totals (exact decimal)
+# -----------------------
+# The one place invoice amounts are worked out; the save path, the PDF and the
+# importer all call it so the stored row and the printed page always agree.
+# Inputs are first brought to their column scales, half-up: qty to 0.001
+# (DECIMAL(12,3)), price, rates and discount to 0.01. Then (half-up to the
+# paisa at each step):
+#   line total = qty x price
+#   subtotal   = sum of the rounded line totals
+#   CGST, SGST = subtotal x rate / 100, each rounded separately
+#   total      = subtotal + CGST + SGST - discount
+PAISA = Decimal("0.01")
+QTY_STEP = Decimal("0.001")
+
+def to_decimal(value) -> Decimal:
+    """Decimal from an int/float/str/Decimal (floats via their shortest repr, so 0.1 stays 0.1)"""
+    if value is None or value == "":
+        return Decimal(0)
+    if isinstance(value, Decimal):
+        return value
+    return Decimal(str(value))
+
+def money(value) -> Decimal:
+    return to_decimal(value).quantize(PAISA, rounding=ROUND_HALF_UP)
+
+def to_qty(value) -> Decimal:
+    return to_decimal(value).quantize(QTY_STEP, rounding=ROUND_HALF_UP)
+
+def line_total(qty, price) -> Decimal:
+    return money(to_qty(qty) * money(price))
+
+def gst_amount(subtotal, rate) -> Decimal:
+    return money(money(subtotal) * money(rate) / 100)
+
+def totals_from_subtotal(subtotal, cgst_rate=0, sgst_rate=0, discount=0) -> dict:
+    """Tax, discount and total once the rounded line totals have been summed"""
+    subtotal = money(subtotal)
+    cgst = gst_amount(subtotal, cgst_rate)
+    sgst = gst_amount(subtotal, sgst_rate)
+    discount = money(discount)
+    return {"subtotal": subtotal, "cgst": cgst, "sgst": sgst, "tax": cgst + sgst,
+            "discount": discount, "total": subtotal + cgst + sgst - discount}
+
+def compute_totals(items, cgst_rate=0, sgst_rate=0, discount=0) -> dict:
+    """Totals for [(desc, qty, price)] lines; every amount is a Decimal rounded to paise"""
+    lines = [line_total(qty, price) for _, qty, price in items]
+    return dict(totals_from_subtotal(sum(lines, Decimal("0.00")), cgst_rate, sgst_rate, discount), lines=lines)
+
+# -----------------------
+# Batch mode (integer paise, vectorized)
+# -----------------------
+# Same rules on whole columns: money in int64 paise, qty in thousandths (the
+# DECIMAL(12,3) scale), rates in hundredths of a percent. Safe while
+# qty_milli x price_paise stays under ~9.2e18.
+def _scaled(values, places: int):
+    """Integers at 10**places, rounded half-up exactly as to_qty/money do.
+
+    Values already on the scale (all stored ones) are converted in float;
+    anything finer goes through Decimal, so e.g. 10.005 gives 1001 and not
+    np.rint's half-even / float-error 1000."""
+    import numpy as np
+    raw = np.asarray(values, dtype=object)
+    scaled = np.asarray(raw, dtype="float64") * 10 ** places
+    out = np.rint(scaled)
+    off_scale = np.flatnonzero(np.abs(scaled - out) > 1e-6)
+    step = Decimal(1).scaleb(-places)
+    for i in off_scale:
+        out[i] = int(to_decimal(raw[i]).quantize(step, rounding=ROUND_HALF_UP).scaleb(places))
+    return out.astype("int64")
+
+def _div_half_up(num, den: int):
+    import numpy as np
+    return np.sign(num) * ((np.abs(num) * 2 + den) // (2 * den))
+
+def to_paise(values):
+    return _scaled(values, 2)
+
+def from_paise(paise):
+    return [Decimal(int(p)).scaleb(-2) for p in paise]
+
+def line_paise(qty, price):
+    """Vectorized line_total in paise"""
+    return _div_half_up(_scaled(qty, 3) * to_paise(price), 1000)
+
+def batch_totals(items, headers, key: str = "doc_id"):
+    """Totals for many documents at once, without a Python loop per document.
+
+    `items` has columns key, qty, price (one row per line); `headers` has key,
+    cgst_rate, sgst_rate, discount. Returns a DataFrame indexed by key with int64
+    paise columns subtotal, cgst, sgst, discount and total. Documents with no
+    lines get a zero subtotal."""
+    import pandas as pd
+    lines = pd.Series(line_paise(items["qty"], items["price"]), index=items.index)
+    subtotal = lines.groupby(items[key].to_numpy(), sort=False).sum()
+    out = pd.DataFrame(index=pd.Index(headers[key].to_numpy(), name=key))
+    out["subtotal"] = subtotal.reindex(out.index, fill_value=0).astype("int64")
+    sub = out["subtotal"].to_numpy()
+    out["cgst"] = _div_half_up(sub * _scaled(headers["cgst_rate"].fillna(0), 2), 10000)
+    out["sgst"] = _div_half_up(sub * _scaled(headers["sgst_rate"].fillna(0), 2), 10000)
+    out["discount"] = to_paise(headers["discount"].fillna(0))
+    out["total"] = out["subtotal"] + out["cgst"] + out["sgst"] - out["discount"]
+    return out
+
+# -----------------------
+# Reconciliation of stored documents
+# -----------------------
+RECONCILE_BATCH = 5000
+
+def reconcile(table: str = "invoices", fix: bool = False, batch: int = RECONCILE_BATCH):
+    """Recompute subtotal/total for every stored document from its line items.
+    Rows still holding legacy items TEXT (not moved to the item tables yet) are skipped.
+
+    Returns a DataFrame of mismatches (id, number, stored and computed amounts);
+    with fix=True the stored header rows are corrected and the rollups follow."""
+    import pandas as pd
+    from sqlalchemy import text
+    import rollups
+    import migrations
+    from db import engine, DOCUMENT_TABLES, ITEM_TABLES
+    number_field = DOCUMENT_TABLES[table]
+    items_table, fk = ITEM_TABLES[table]
+    mismatches = []
+    after = 0
+    while True:
+        with engine.connect() as conn:
+            headers = pd.DataFrame(conn.execute(text(f"""
+                SELECT id AS doc_id, {number_field} AS number, subtotal, cgst_rate, sgst_rate, discount, total
+                FROM {table} WHERE id > :after AND items IS NULL ORDER BY id LIMIT :limit
+            """), {"after": after, "limit": batch}).mappings().all())
+            if headers.empty:
+                break
+            items = pd.DataFrame(conn.execute(text(f"""
+                SELECT {fk} AS doc_id, qty, unit_price AS price FROM {items_table}
+                WHERE {fk} BETWEEN :lo AND :hi
+            """), {"lo": int(headers["doc_id"].iloc[0]), "hi": int(headers["doc_id"].iloc[-1])}).mappings().all(),
+                columns=["doc_id", "qty", "price"])
+        after = int(headers["doc_id"].iloc[-1])
+        computed = batch_totals(items, headers)
+        stored_subtotal = to_paise(headers["subtotal"].fillna(0))
+        stored_total = to_paise(headers["total"].fillna(0))
+        bad = (stored_subtotal != computed["subtotal"].to_numpy()) | (stored_total != computed["total"].to_numpy())
+        if bad.any():
+            found = pd.DataFrame({
+                "id": headers["doc_id"].to_numpy()[bad], "number": headers["number"].to_numpy()[bad],
+                "stored_subtotal": from_paise(stored_subtotal[bad]),
+                "subtotal": from_paise(computed["subtotal"].to_numpy()[bad]),
+                "stored_total": from_paise(stored_total[bad]),
+                "total": from_paise(computed["total"].to_numpy()[bad]),
+            })
+            mismatches.append(found)
+            if fix:
+                ids = [int(i) for i in found["id"]]
+                with engine.begin() as conn:
+                    # rows the rollups backfill has not reached get the new amounts from it
+                    unrolled = migrations.pending_ids(conn, "rollups", table)
+                    rolled = [i for i in ids if i not in unrolled]
+                    rollups.apply_documents(conn, table, rolled, sign=-1)
+                    conn.execute(text(f"UPDATE {table} SET subtotal = :subtotal, total = :total WHERE id = :id"),
+                                 [{"id": int(r.id), "subtotal": r.subtotal, "total": r.total}
+                                  for r in found.itertuples()])
+                    rollups.apply_documents(conn, table, rolled)
+    if not mismatches:
+        return pd.DataFrame(columns=["id", "number", "stored_subtotal", "subtotal", "stored_total", "total"])
+    return pd.concat(mismatches, ignore_index=True)
+
+# -----------------------
+# CLI
+# -----------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check stored invoice/quotation totals against their line items")
+    parser.add_argument("command", choices=["verify"])
+    parser.add_argument("--table", choices=["invoices", "quotations"], default="invoices")
+    parser.add_argument("--fix", action="store_true", help="rewrite mismatching subtotal/total columns")
+    args = parser.parse_args(argv)
+    mismatches = reconcile(args.table, fix=args.fix)
+    if len(mismatches):
+        print(mismatches.to_string(index=False))
+    action = "fixed" if args.fix else "found"
+    sys.stderr.write(f"{len(mismatches)} mismatching {args.table} {action}\n")
+    return 1 if len(mismatches) and not args.fix else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
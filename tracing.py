@@ -0,0 +1,162 @@
+import os
+import sys
+import json
+import time
+import logging
+import threading
+import functools
+import contextvars
+from collections import deque
+from contextlib import nullcontext
+
+# -----------------------
+# Lightweight span tracing
+# -----------------------
+# Off unless TRACING=1. Disabled, span() hands back one shared no-op context
+# manager and @traced returns the function itself, so instrumented code pays
+# one attribute lookup at most. Enabled, every span feeds a rolling window
+# per name (p50/p95/p99), published as Prometheus text (render_prometheus(),
+# optionally TRACING_PROM_FILE for a textfile collector) and as one JSON log
+# line per span name every TRACING_LOG_SECONDS. Spans opened under trace()
+# are also kept as the breakdown of that trace (one Streamlit rerun).
+# Numbers are per process.
+ENABLED = os.getenv("TRACING", "").lower() in ("1", "true", "yes", "on")
+WINDOW = int(os.getenv("TRACING_WINDOW", "1000"))            # samples kept per span name
+LOG_SECONDS = float(os.getenv("TRACING_LOG_SECONDS", "60"))
+PROM_FILE = os.getenv("TRACING_PROM_FILE")
+QUANTILES = (0.5, 0.95, 0.99)
+
+log = logging.getLogger("tracing")
+
+_current = contextvars.ContextVar("trace", default=None)
+_lock = threading.Lock()
+_windows = {}       # name -> deque of recent durations (seconds)
+_totals = {}        # name -> [count, sum] since start
+_last_flush = time.monotonic()
+_NOOP = nullcontext()
+
+
+class _Span:
+    __slots__ = ("name", "trace", "depth", "start")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.trace = trace = _current.get()
+        if trace is not None:
+            self.depth = trace["depth"]
+            trace["depth"] += 1
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        trace = self.trace
+        if trace is not None:
+            trace["depth"] -= 1
+            trace["spans"].append((self.start - trace["start"], self.depth, self.name, elapsed))
+        record(self.name, elapsed)
+        return False
+
+
+def span(name: str):
+    """Context manager timing the enclosed block under `name`"""
+    return _Span(name) if ENABLED else _NOOP
+
+def traced(name: str = None):
+    """Decorator form of span(); a no-op (the function itself) when tracing is off"""
+    def decorate(fn):
+        if not ENABLED:
+            return fn
+        label = name or f"{fn.__module__}.{fn.__name__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _Span(label):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def trace(name: str):
+    """Start a fresh breakdown for this context and time it as its root span"""
+    if not ENABLED:
+        return _NOOP
+    _current.set({"start": time.perf_counter(), "depth": 0, "spans": []})
+    return _Span(name)
+
+def current_trace() -> list:
+    """Spans of the latest trace() in this context, in start order: dicts of name, depth, offset, seconds"""
+    trace = _current.get()
+    if trace is None:
+        return []
+    return [{"name": name, "depth": depth, "offset": offset, "seconds": seconds}
+            for offset, depth, name, seconds in sorted(trace["spans"])]
+
+# -----------------------
+# Rolling statistics
+# -----------------------
+def record(name: str, seconds: float):
+    global _last_flush
+    with _lock:
+        window = _windows.get(name)
+        if window is None:
+            window = _windows[name] = deque(maxlen=WINDOW)
+            _totals[name] = [0, 0.0]
+        window.append(seconds)
+        totals = _totals[name]
+        totals[0] += 1
+        totals[1] += seconds
+        now = time.monotonic()
+        due = now - _last_flush >= LOG_SECONDS
+        if due:
+            _last_flush = now
+    if due:
+        flush()
+
+def _quantile(ordered: list, q: float) -> float:
+    # nearest rank
+    return ordered[min(len(ordered) - 1, max(0, int(q * len(ordered) + 0.5) - 1))]
+
+def snapshot() -> dict:
+    """{span name: {count, sum, p50, p95, p99}} -- percentiles over the rolling window, in seconds"""
+    with _lock:
+        data = {name: (sorted(window), tuple(_totals[name])) for name, window in _windows.items()}
+    return {name: dict(count=count, sum=total, **{f"p{round(q * 100)}": _quantile(ordered, q) for q in QUANTILES})
+            for name, (ordered, (count, total)) in data.items()}
+
+def render_prometheus(stats: dict = None) -> str:
+    """Snapshot as a Prometheus summary (text exposition format 0.0.4)"""
+    stats = snapshot() if stats is None else stats
+    lines = [f"# HELP app_span_seconds Span durations; quantiles over the last {WINDOW} samples per span.",
+             "# TYPE app_span_seconds summary"]
+    for name in sorted(stats):
+        s = stats[name]
+        label = name.replace("\\", "\\\\").replace('"', '\\"')
+        for q in QUANTILES:
+            lines.append(f'app_span_seconds{{span="{label}",quantile="{q}"}} {s[f"p{round(q * 100)}"]:.6f}')
+        lines.append(f'app_span_seconds_sum{{span="{label}"}} {s["sum"]:.6f}')
+        lines.append(f'app_span_seconds_count{{span="{label}"}} {s["count"]}')
+    return "\n".join(lines) + "\n"
+
+def flush():
+    """Write the current percentiles as JSON log lines (and TRACING_PROM_FILE when set)"""
+    stats = snapshot()
+    ts = time.strftime("%Y-%m-%dT%H:%M:%S")
+    for name in sorted(stats):
+        s = stats[name]
+        log.info(json.dumps({"ts": ts, "span": name, "count": s["count"],
+                             **{k: round(s[k] * 1000, 3) for k in ("p50", "p95", "p99")}, "unit": "ms"}))
+    if PROM_FILE:
+        tmp = f"{PROM_FILE}.{os.getpid()}.tmp"
+        with open(tmp, "w") as fh:
+            fh.write(render_prometheus(stats))
+        os.replace(tmp, PROM_FILE)
+
+if ENABLED and not log.handlers:
+    _handler = logging.FileHandler(os.environ["TRACING_LOG_FILE"]) if os.getenv("TRACING_LOG_FILE") \
+        else logging.StreamHandler(sys.stderr)
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    log.addHandler(_handler)
+    log.setLevel(logging.INFO)
+    log.propagate = False
@@ -1,31 +1,28 @@
 import os
 from io import BytesIO
-from PIL import Image
 import streamlit as st
-from sqlalchemy import text
-from num2words import num2words
-from reportlab.platypus import Image as RLImage
-from db import engine
+from db import delete_row as db_delete_row
+from tracing import traced
+from item_parser import parse_text, parse_file
 
 LOGO_PATH = "Logo.jpg"
 GST_NO = "27AAATT1566E1ZJ"
+MAX_SHOWN_ERRORS = 100
 
-def parse_items(items_text: str):
-    items = []
-    for line in items_text.splitlines():
-        if not line.strip():
-            continue
-        parts = [p.strip() for p in line.split("|")]
-        if len(parts) < 3:
-            st.error("Each item line must be: description | qty | price")
-            st.stop()
-        desc = "|".join(parts[:-2])
-        qty = float(parts[-2])
-        price = float(parts[-1])
-        items.append((desc, qty, price))
-    return items
+@traced("parse_items")
+def parse_items(source):
+    """[(desc, qty, price)] from pasted text or an uploaded file; every bad line is reported at once"""
+    parsed = parse_file(source) if hasattr(source, "read") else parse_text(source)
+    if parsed.errors:
+        shown = "\n".join(f"- Line {n}: {message}" for n, message in parsed.errors[:MAX_SHOWN_ERRORS])
+        more = len(parsed.errors) - MAX_SHOWN_ERRORS
+        st.error(f"{len(parsed.errors)} item line(s) need fixing; each line is description | qty | price.\n\n"
+                 + shown + (f"\n- …and {more} more" if more > 0 else ""))
+        st.stop()
+    return parsed.items()
 
 def amount_in_words_international(amount):
+    from num2words import num2words
     rupees = int(amount)
     paise = int(round((amount - rupees) * 100))
     words_rupees = num2words(rupees, lang='en').replace("-", " ").capitalize()
@@ -37,10 +34,11 @@ def amount_in_words_international(amount):
     return result
 
 def delete_row(table: str, field: str, value: str):
-    with engine.begin() as conn:
-        conn.execute(text(f"DELETE FROM {table} WHERE {field} = :v"), {"v": value})
+    db_delete_row(table, field, value)
 
 def make_logo_rlimage(max_width_px=80):
+    from PIL import Image
+    from reportlab.platypus import Image as RLImage
     if not os.path.exists(LOGO_PATH):
         return None
     try: